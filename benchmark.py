@@ -0,0 +1,651 @@
+"""Performance benchmarks for Orion.
+
+Usage:
+    python benchmark.py prefix-cache --model <model folder or Hugging Face id> [--runs 5]
+    python benchmark.py batching --model <model folder or Hugging Face id> [--concurrency 1 2 4 8] [--tokens 64]
+    python benchmark.py load --model <model folder or Hugging Face id> [--tokens 32]
+    python benchmark.py quantization --model <model folder or Hugging Face id> [--modes none int8] [--tokens 32]
+    python benchmark.py threads --model <model folder or Hugging Face id> [--counts 1 2 4 8] [--tokens 64] [--runs 3]
+    python benchmark.py speculative --model <main model> --draft <draft model> [--tokens 128] [--runs 3]
+    python benchmark.py entities [--seconds 1]
+    python benchmark.py cipher [--sizes 0.01 1 10] [--seconds 1]
+    python benchmark.py chat-search [--chats 20000] [--messages 20]
+    python benchmark.py suite [--model <model>] [--output benchmark_results.json] [--compare <earlier results>]
+
+"suite" needs no network: unless --model is given it builds a tiny random model with its own
+tokenizer in a temporary folder, so its numbers track Orion's overhead rather than model quality.
+Its results are written as JSON (with the git commit) to compare runs across commits.
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+
+import main
+
+
+def load_chatbot(model_path):
+    # Skip the default model the constructor would load and go straight to the one under test
+    main.AI_AVAILABLE = False
+    orion = main.OrionChatbot()
+    orion.response_cache_enabled = False  # Every run has to actually generate
+    if not orion.load_model(model_path):
+        raise SystemExit(f"Could not load model {model_path}")
+    return orion
+
+
+def time_to_first_token(stream):
+    start = time.perf_counter()
+    for _ in stream:
+        break
+    elapsed = time.perf_counter() - start
+    stream.close()
+    return elapsed
+
+
+def report(title, rows):
+    print(f"\n{title}")
+    print("-" * len(title))
+    width = max(len(name) for name, _ in rows)
+    for name, value in rows:
+        print(f"{name.ljust(width)}  {value}")
+
+
+def bench_prefix_cache(args):
+    # Prefill cost of a chat request with and without the shared system prompt KV cache
+    orion = load_chatbot(args.model)
+    messages = orion._build_chat_messages("Hi Orion, what can you help me with today?")
+    prompt = orion.llm.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    prompt_tokens = len(orion.llm.tokenizer(prompt, add_special_tokens=False)["input_ids"])
+    prefix_ids, _ = orion._get_prefix_cache(messages[:1])
+
+    # Warm-up so one-time allocations don't count against either side
+    time_to_first_token(orion._stream_generate(prompt, max_new_tokens=1, do_sample=False))
+
+    cold, warm = [], []
+    for _ in range(args.runs):
+        cold.append(time_to_first_token(orion._stream_generate(prompt, max_new_tokens=1, do_sample=False)))
+        warm.append(time_to_first_token(orion._stream_generate(prompt, prefix_messages=messages[:1], max_new_tokens=1, do_sample=False)))
+
+    cold_ms = statistics.median(cold) * 1000
+    warm_ms = statistics.median(warm) * 1000
+    report("Shared system prompt prefix cache", [
+        ("prompt tokens", prompt_tokens),
+        ("cached prefix tokens", len(prefix_ids)),
+        ("full prefill (median)", f"{cold_ms:.1f} ms"),
+        ("prefill with prefix cache (median)", f"{warm_ms:.1f} ms"),
+        ("saved per request", f"{cold_ms - warm_ms:.1f} ms"),
+    ])
+
+
+def bench_batching(args):
+    # Aggregate decode throughput with N chats generating at once, with and without the scheduler
+    orion = load_chatbot(args.model)
+    tokenizer = orion.llm.tokenizer
+    questions = ["Tell me about the ocean.", "How do airplanes fly?", "Write a short poem about autumn.",
+                 "What is a prime number?", "Give me three dinner ideas.", "Explain photosynthesis.",
+                 "Why is the sky blue?", "Describe a busy city street."]
+
+    def measure(concurrency):
+        produced = [0] * concurrency
+
+        def worker(i):
+            messages = [{'role': 'system', 'content': orion._default_system_prompt()},
+                        {'role': 'user', 'content': questions[i % len(questions)]}]
+            prompt = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+            text = "".join(orion._stream_generate(prompt, prefix_messages=messages[:1], max_new_tokens=args.tokens,
+                                                  do_sample=False))
+            produced[i] = len(tokenizer(text, add_special_tokens=False)["input_ids"])
+
+        threads = [threading.Thread(target=worker, args=(i,)) for i in range(concurrency)]
+        start = time.perf_counter()
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        return sum(produced) / (time.perf_counter() - start)
+
+    rows = []
+    for batching in (False, True):
+        orion.batching_enabled = batching
+        measure(1)  # Warm-up
+        for concurrency in args.concurrency:
+            label = "batched" if batching else "unbatched"
+            rows.append((f"{label}, {concurrency} concurrent", f"{measure(concurrency):.1f} tok/s"))
+    report("Aggregate generation throughput", rows)
+
+
+def peak_rss_mb():
+    import resource  # Not available on Windows
+
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024  # bytes on macOS, KB on Linux
+
+
+def load_once(args):
+    # Runs in a fresh process started by bench_load and prints its measurements as JSON
+    import importlib
+    from model_registry import model_memory
+
+    importlib.import_module("transformers.pipelines")  # Library memory belongs to the baseline, not the load
+
+    main.AI_AVAILABLE = False
+    orion = main.OrionChatbot()
+    orion.low_memory_loading = not args.full_precision
+    orion.half_precision = args.half_precision
+    orion.response_cache_enabled = False
+    orion.batching_enabled = False  # Time model.generate itself
+    baseline = peak_rss_mb()
+    start = time.perf_counter()
+    if not orion.load_model(args.model):
+        raise SystemExit(1)
+    load_seconds = time.perf_counter() - start
+    peak = peak_rss_mb()
+
+    # Decode speed in the loaded dtype (after one warm-up reply)
+    messages = orion._build_chat_messages(QUALITY_PROMPTS[1])
+    prompt = orion.llm.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    "".join(orion._stream_generate(prompt, max_new_tokens=4, do_sample=False))
+    trace = orion.tracer.start('benchmark')
+    "".join(orion._stream_generate(prompt, trace=trace, max_new_tokens=args.tokens, do_sample=False))
+    orion.tracer.finish(trace)
+    speed = trace.tokens_per_second()
+    print(json.dumps({
+        'load_seconds': load_seconds,
+        'baseline_rss_mb': baseline,
+        'peak_rss_mb': peak,
+        'weights_mb': model_memory(orion.llm) / 1024 ** 2,
+        'dtype': str(orion.llm.model.dtype),
+        'ms_per_token': 1000 / speed if speed else None,
+    }))
+
+
+def bench_load(args):
+    # Load time, peak memory and decode speed of a plain float32 load, the low-memory float32 load
+    # (the default) and half precision, each in a new process
+    try:
+        peak_rss_mb()
+    except ImportError:
+        raise SystemExit("Peak RSS needs the resource module (Linux/macOS)")
+
+    rows = []
+    for label, flags in (("full precision", ["--full-precision"]), ("low-memory", []),
+                         ("half precision", ["--half-precision"])):
+        command = [sys.executable, __file__, "load-once", "--model", args.model, "--tokens", str(args.tokens)] + flags
+        result = subprocess.run(command, capture_output=True, text=True)
+        if result.returncode != 0:
+            raise SystemExit(f"Loading {args.model} failed:\n{result.stderr}")
+        stats = json.loads(result.stdout.strip().splitlines()[-1])
+        rows += [
+            (f"{label}: weights dtype", stats['dtype']),
+            (f"{label}: load time", f"{stats['load_seconds']:.2f} s"),
+            (f"{label}: weights", f"{stats['weights_mb']:.1f} MB"),
+            (f"{label}: peak RSS", f"{stats['peak_rss_mb']:.0f} MB (+{stats['peak_rss_mb'] - stats['baseline_rss_mb']:.0f} MB for the load)"),
+            (f"{label}: decode", "n/a" if stats['ms_per_token'] is None else f"{stats['ms_per_token']:.1f} ms/token"),
+        ]
+    report("Model load", rows)
+
+
+QUALITY_PROMPTS = [
+    "What is the capital of France?",
+    "Explain how a rainbow forms in two sentences.",
+    "Write a Python function that reverses a string.",
+    "Give me a tip for staying focused while studying.",
+    "What is 17 multiplied by 3?",
+]
+
+
+def reference_sequences(orion, tokens):
+    # Greedy continuations of the quality prompts, as (prompt + reply ids, prompt length)
+    import torch
+
+    tokenizer = orion.llm.tokenizer
+    sequences = []
+    for question in QUALITY_PROMPTS:
+        messages = [{'role': 'system', 'content': orion._default_system_prompt()}, {'role': 'user', 'content': question}]
+        prompt = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        ids = tokenizer(prompt, add_special_tokens=False)["input_ids"]
+        with torch.no_grad():
+            output = orion.llm.model.generate(torch.tensor([ids]), max_new_tokens=tokens, do_sample=False,
+                                              pad_token_id=tokenizer.eos_token_id)
+        sequences.append((output[0].tolist(), len(ids)))
+    return sequences
+
+
+def next_token_agreement(orion, sequences):
+    # Share of reply positions where the model's top token matches the reference reply
+    import torch
+
+    matches = total = 0
+    with torch.no_grad():
+        for ids, start in sequences:
+            logits = orion.llm.model(torch.tensor([ids])).logits[0]
+            predicted = logits[start - 1:-1].argmax(-1).tolist()
+            matches += sum(p == e for p, e in zip(predicted, ids[start:]))
+            total += len(ids) - start
+    return matches / max(total, 1)
+
+
+def bench_quantization(args):
+    # Accuracy and speed of each quantization mode, compared with the unquantized model
+    import importlib
+    from model_registry import model_memory
+
+    importlib.import_module("transformers.pipelines")  # Keep one-time import cost out of the load times
+    modes = ["none"] + [mode for mode in args.modes if mode != "none"]
+    references = None
+    rows = []
+    for mode in modes:
+        main.AI_AVAILABLE = False
+        orion = main.OrionChatbot()
+        orion.response_cache_enabled = False
+        start = time.perf_counter()
+        if not orion.load_model(args.model, quantization=mode):
+            raise SystemExit(f"Could not load model {args.model} with {mode} weights")
+        load_seconds = time.perf_counter() - start
+        if references is None:
+            references = reference_sequences(orion, args.tokens)
+
+        prompt = orion.llm.tokenizer.decode(references[0][0][:references[0][1]])
+        "".join(orion._stream_generate(prompt, max_new_tokens=4, do_sample=False))  # Warm-up
+        start = time.perf_counter()
+        reply = "".join(orion._stream_generate(prompt, max_new_tokens=args.tokens, do_sample=False))
+        elapsed = time.perf_counter() - start
+        reply_tokens = max(len(orion.llm.tokenizer(reply, add_special_tokens=False)["input_ids"]), 1)
+
+        rows += [
+            (f"{mode}: load time", f"{load_seconds:.2f} s"),
+            (f"{mode}: weights", f"{model_memory(orion.llm) / 1024 ** 2:.1f} MB"),
+            (f"{mode}: latency", f"{elapsed / reply_tokens * 1000:.1f} ms/token"),
+            (f"{mode}: agreement with full precision", f"{next_token_agreement(orion, references):.1%}"),
+        ]
+        orion._stop_scheduler()  # Its thread holds the model, which would stay in memory for the next modes
+        del orion
+    report("Quantization modes", rows)
+
+
+def bench_threads(args):
+    # Single-reply decode speed for each intra-op thread count
+    orion = load_chatbot(args.model)
+    tokenizer = orion.llm.tokenizer
+    messages = [{'role': 'system', 'content': orion._default_system_prompt()},
+                {'role': 'user', 'content': "Write a short story about a lighthouse keeper."}]
+    prompt = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+    counts = args.counts or sorted({1, 2, 4, 8, os.cpu_count() or 1} & set(range(1, (os.cpu_count() or 1) + 1)))
+
+    rows = []
+    for count in counts:
+        intra, inter = orion.configure_threads(count)
+        "".join(orion._stream_generate(prompt, max_new_tokens=4, do_sample=False))  # Warm-up
+        speeds = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            text = "".join(orion._stream_generate(prompt, max_new_tokens=args.tokens, do_sample=False))
+            produced = len(tokenizer(text, add_special_tokens=False)["input_ids"])
+            speeds.append(produced / (time.perf_counter() - start))
+        rows.append((f"{intra} intra-op / {inter} inter-op threads", f"{statistics.median(speeds):.1f} tok/s"))
+    auto = main.default_thread_counts()
+    rows.append(("autodetected", f"{auto[0]} intra-op / {auto[1]} inter-op threads"))
+    report("Decode speed by thread count", rows)
+
+
+def bench_speculative(args):
+    # Decode speed of a chat reply with and without the draft model (greedy, so the text must match)
+    orion = load_chatbot(args.model)
+    orion.response_cache_enabled = False
+    orion.batching_enabled = False  # Otherwise the run without a draft goes through the batch scheduler
+    tokenizer = orion.llm.tokenizer
+    messages = [{'role': 'system', 'content': orion._default_system_prompt()},
+                {'role': 'user', 'content': "Explain how a bicycle works."}]
+    prompt = tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+
+    def measure():
+        "".join(orion._stream_generate(prompt, max_new_tokens=4, do_sample=False))  # Warm-up
+        speeds = []
+        for _ in range(args.runs):
+            start = time.perf_counter()
+            text = "".join(orion._stream_generate(prompt, max_new_tokens=args.tokens, do_sample=False))
+            produced = len(tokenizer(text, add_special_tokens=False)["input_ids"])
+            speeds.append(produced / (time.perf_counter() - start))
+        return statistics.median(speeds), text
+
+    # Measure without a draft first, restoring whatever pairing the model had afterwards
+    saved = orion.draft_model, orion.draft_model_name
+    orion.draft_model, orion.draft_model_name = None, None
+    plain_speed, plain_text = measure()
+    if not orion._load_draft_model(args.draft):
+        raise SystemExit(f"Could not use {args.draft} as a draft model")
+    draft_speed, draft_text = measure()
+    orion.draft_model, orion.draft_model_name = saved
+
+    report("Speculative decoding", [
+        ("main model", args.model),
+        ("draft model", args.draft),
+        ("without draft (median)", f"{plain_speed:.1f} tok/s"),
+        ("with draft (median)", f"{draft_speed:.1f} tok/s"),
+        ("speed-up", f"{draft_speed / plain_speed:.2f}x"),
+        ("identical output", "yes" if plain_text == draft_text else "no"),
+    ])
+
+
+SUITE_MESSAGES = [
+    "Hi Orion, how are you today?",
+    "Can you recommend a restaurant in Paris for dinner tomorrow at 7pm?",
+    "I'm learning Python and JavaScript, what should I build first?",
+    "My email is jane.doe@example.com and my phone is 555-123-4567",
+    "What's the weather like in Tokyo this weekend?",
+    "Tell me a joke about programmers",
+    "How much does a flight from London to New York cost in December?",
+    "thanks, that was helpful!",
+]
+
+
+def bench_entities(args):
+    # Entity extraction speed on short chat messages and on one long pasted text
+    from entity_extractor import extract_entities
+
+    long_text = " ".join(SUITE_MESSAGES * 25)
+    rows = []
+    for label, inputs in (("chat messages", SUITE_MESSAGES), (f"{len(long_text)}-character text", [long_text])):
+        rate = calls_per_second(extract_entities, inputs, args.seconds)
+        rows.append((label, f"{rate:,.0f} calls/s ({1e6 / rate:.1f} us per call)"))
+    found = sum(len(extract_entities(message)) for message in SUITE_MESSAGES)
+    rows.append(("entities in the chat messages", str(found)))
+    report("extract_entities", rows)
+
+
+def reference_xor_cipher(data):
+    # The original byte-by-byte chat file cipher, to check and compare chat_storage.xor_cipher against
+    from chat_storage import CIPHER_KEY
+    return bytes([b ^ CIPHER_KEY[i % len(CIPHER_KEY)] for i, b in enumerate(data)])
+
+
+def bench_cipher(args):
+    # Chat file cipher throughput (MB/s) for a range of file sizes, against the byte-by-byte version
+    from chat_storage import xor_cipher
+
+    rows = []
+    for size_mb in args.sizes:
+        data = os.urandom(int(size_mb * 1024 * 1024))
+        if xor_cipher(data) != reference_xor_cipher(data):
+            raise SystemExit(f"xor_cipher output differs from the reference at {size_mb} MB")
+        rate = calls_per_second(xor_cipher, [data], args.seconds) * size_mb
+        reference_rate = calls_per_second(reference_xor_cipher, [data], args.seconds) * size_mb
+        rows.append((f"{size_mb} MB", f"{rate:,.1f} MB/s (byte-by-byte: {reference_rate:,.1f} MB/s, "
+                                     f"{rate / reference_rate:.0f}x)"))
+    report("Chat file cipher", rows)
+
+
+def sample_chat(message_count, seed=0):
+    history = []
+    for i in range(message_count // 2):
+        history.append(f"You: {SUITE_MESSAGES[(i + seed) % len(SUITE_MESSAGES)]}\n")
+        history.append(f"Orion: Reply {seed}-{i}. " + "Here is a fairly typical reply with a few sentences of text. " * 8 + "\n")
+    return history
+
+
+def bench_chat_search(args):
+    # Sidebar search (titles only, and titles plus message bodies) over a store of many chats
+    from chat_store import ChatStore
+
+    with tempfile.TemporaryDirectory() as work_dir:
+        store = ChatStore(work_dir)
+        start = time.perf_counter()
+        with store.lock, store.connection:  # One transaction, a commit per chat would dominate
+            for chat_id in range(args.chats):
+                store._save(chat_id, {'history': sample_chat(args.messages, chat_id), 'timestamp': chat_id,
+                                      'custom_title': f"Chat {chat_id} about {SUITE_MESSAGES[chat_id % 7].split()[-1]}"})
+        build_seconds = time.perf_counter() - start
+        store.histories.clear()
+
+        rows = [("store", f"{args.chats} chats x {args.messages} messages, built in {build_seconds:.1f} s, "
+                          f"{os.path.getsize(store.path) / 1024 / 1024:.0f} MB")]
+        for query in ("", "Chat 1234", "flight", "lond", "Reply 777-", "no such text"):
+            for search_messages in (False, True):
+                times = []
+                for _ in range(args.runs):
+                    start = time.perf_counter()
+                    found = store.list(query, search_messages=search_messages)
+                    times.append(time.perf_counter() - start)
+                label = f"{query!r} ({'titles and messages' if search_messages else 'titles'})"
+                rows.append((label, f"{statistics.median(times) * 1000:.1f} ms, {len(found)} chats"))
+        store.close()
+    report("Chat search", rows)
+
+
+def build_test_model(path):
+    # Tiny randomly initialised Qwen2 model with a small BPE tokenizer and ChatML template, made
+    # from scratch so nothing has to be downloaded. Same seed and corpus, same model every time.
+    import torch
+    from tokenizers import Tokenizer, decoders, models, pre_tokenizers, trainers
+    from transformers import PreTrainedTokenizerFast, Qwen2Config, Qwen2ForCausalLM
+
+    tokenizer = Tokenizer(models.BPE(unk_token="<unk>"))
+    tokenizer.pre_tokenizer = pre_tokenizers.ByteLevel(add_prefix_space=False)
+    tokenizer.decoder = decoders.ByteLevel()
+    trainer = trainers.BpeTrainer(vocab_size=512, special_tokens=["<unk>", "<|im_start|>", "<|im_end|>"],
+                                  initial_alphabet=pre_tokenizers.ByteLevel.alphabet(), show_progress=False)
+    tokenizer.train_from_iterator(SUITE_MESSAGES * 20, trainer)
+    tokenizer = PreTrainedTokenizerFast(tokenizer_object=tokenizer, unk_token="<unk>",
+                                        eos_token="<|im_end|>", pad_token="<|im_end|>")
+    tokenizer.chat_template = ("{% for m in messages %}<|im_start|>{{ m['role'] }}\n{{ m['content'] }}<|im_end|>\n{% endfor %}"
+                               "{% if add_generation_prompt %}<|im_start|>assistant\n{% endif %}")
+    tokenizer.save_pretrained(path)
+
+    torch.manual_seed(0)
+    config = Qwen2Config(vocab_size=len(tokenizer), hidden_size=64, intermediate_size=128, num_hidden_layers=2,
+                         num_attention_heads=4, num_key_value_heads=2, max_position_embeddings=4096,
+                         eos_token_id=tokenizer.eos_token_id, pad_token_id=tokenizer.pad_token_id, tie_word_embeddings=True)
+    Qwen2ForCausalLM(config).save_pretrained(path)
+    return path
+
+
+def calls_per_second(func, inputs, seconds):
+    # Run func over inputs repeatedly for at least the given time
+    calls = 0
+    start = time.perf_counter()
+    while True:
+        for item in inputs:
+            func(item)
+        calls += len(inputs)
+        elapsed = time.perf_counter() - start
+        if elapsed >= seconds:
+            return calls / elapsed
+
+
+def git_commit():
+    try:
+        result = subprocess.run(["git", "rev-parse", "HEAD"], capture_output=True, text=True,
+                                cwd=os.path.dirname(os.path.abspath(__file__)))
+        return result.stdout.strip() or None
+    except OSError:
+        return None
+
+
+def bench_suite(args):
+    # End-to-end and per-stage numbers in one run: load, time to first token and decode speed
+    # (from the request traces), the rule-based stages and chat save/load
+    import torch
+    import transformers
+    from chat_store import ChatStore
+
+    os.environ.setdefault("HF_HUB_OFFLINE", "1")
+    metrics = {}
+    with tempfile.TemporaryDirectory() as work_dir:
+        model_path = args.model or build_test_model(os.path.join(work_dir, "model"))
+
+        # Responses, intents, the knowledge base and model settings come from the empty work dir,
+        # not the user's data dir, so results don't depend on local files
+        main.AI_AVAILABLE = False
+        orion = main.OrionChatbot(data_dir=work_dir)
+        orion.response_cache_enabled = False
+        load_times = []
+        for _ in range(args.runs):
+            orion.model_registry.remove(model_path)  # Force a real load every time
+            start = time.perf_counter()
+            # Full precision whatever the model folder says; its draft pairing is dropped below
+            if not orion.load_model(model_path, quantization="none"):
+                raise SystemExit(f"Could not load model {model_path}")
+            load_times.append(time.perf_counter() - start)
+        metrics['load_seconds'] = statistics.median(load_times)
+        orion.draft_model, orion.draft_model_name = None, None
+
+        # Time to first token and decode speed of a one-off chat reply
+        messages = orion._build_chat_messages(SUITE_MESSAGES[1])
+        prompt = orion.llm.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+        "".join(orion._stream_generate(prompt, prefix_messages=messages[:1], max_new_tokens=4, do_sample=False))  # Warm-up
+        first_token, speeds = [], []
+        for _ in range(args.runs):
+            trace = orion.tracer.start('benchmark')
+            "".join(orion._stream_generate(prompt, trace=trace, prefix_messages=messages[:1],
+                                           max_new_tokens=args.tokens, do_sample=False))
+            first_token.append(trace.stage_ms('prefill'))
+            if trace.tokens_per_second():
+                speeds.append(trace.tokens_per_second())
+        metrics['time_to_first_token_ms'] = statistics.median(first_token)
+        metrics['decode_tokens_per_second'] = statistics.median(speeds) if speeds else None
+
+        # Rule-based stages that run on every message
+        metrics['extract_entities_per_second'] = calls_per_second(orion.extract_entities, SUITE_MESSAGES, args.seconds)
+        lowered = [message.lower() for message in SUITE_MESSAGES]
+        metrics['get_custom_response_per_second'] = calls_per_second(orion.get_custom_response, lowered, args.seconds)
+
+        # Chat store round trip for a chat of the given length
+        history = sample_chat(args.chat_messages)
+        chat = {'history': history, 'model': "Basic", 'timestamp': time.time(), 'pinned': False}
+        store = ChatStore(work_dir)
+        save_times, load_times, append_times = [], [], []
+        for run in range(args.runs):
+            start = time.perf_counter()
+            store.save(run + 1, chat)  # A new chat every time
+            save_times.append(time.perf_counter() - start)
+            store.histories.clear()  # Load from the database, not from what was just saved
+            start = time.perf_counter()
+            store.load(run + 1)
+            load_times.append(time.perf_counter() - start)
+        metrics['chat_save_ms'] = statistics.median(save_times) * 1000
+        metrics['chat_load_ms'] = statistics.median(load_times) * 1000
+
+        # Saving after one more reply, as the GUI does after every message
+        for _ in range(args.runs):
+            history.append("Orion: One more reply.\n")
+            start = time.perf_counter()
+            store.save(1, chat)
+            append_times.append(time.perf_counter() - start)
+        metrics['chat_append_ms'] = statistics.median(append_times) * 1000
+        store.close()
+        orion._stop_scheduler()
+
+    results = {
+        'commit': git_commit(),
+        'timestamp': time.time(),
+        'model': args.model or "tiny test model",
+        'python': platform.python_version(),
+        'torch': torch.__version__,
+        'transformers': transformers.__version__,
+        'cpu_count': os.cpu_count(),
+        'settings': {'runs': args.runs, 'tokens': args.tokens, 'chat_messages': args.chat_messages},
+        'metrics': metrics,
+    }
+    with open(args.output, "w", encoding="utf-8") as f:
+        json.dump(results, f, indent=4)
+
+    baseline = {}
+    if args.compare:
+        with open(args.compare, "r", encoding="utf-8") as f:
+            baseline = json.load(f).get('metrics', {})
+    rows = []
+    for name, value in metrics.items():
+        text = "n/a" if value is None else f"{value:.3f}"
+        old = baseline.get(name)
+        if value is not None and old:
+            text += f"  (was {old:.3f}, {(value - old) / old * 100:+.1f}%)"
+        rows.append((name, text))
+    report(f"Benchmark suite ({results['model']}) -> {args.output}", rows)
+
+
+def run():
+    parser = argparse.ArgumentParser(description="Orion performance benchmarks")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    prefix = commands.add_parser("prefix-cache", help="Prefill time saved by the shared system prompt cache")
+    prefix.add_argument("--model", default="Qwen/Qwen2.5-1.5B-Instruct", help="Model folder or Hugging Face id")
+    prefix.add_argument("--runs", type=int, default=5)
+    prefix.set_defaults(func=bench_prefix_cache)
+
+    batching = commands.add_parser("batching", help="Aggregate tokens/sec vs. number of concurrent requests")
+    batching.add_argument("--model", default="Qwen/Qwen2.5-1.5B-Instruct", help="Model folder or Hugging Face id")
+    batching.add_argument("--concurrency", type=int, nargs="+", default=[1, 2, 4, 8])
+    batching.add_argument("--tokens", type=int, default=64, help="New tokens per request")
+    batching.set_defaults(func=bench_batching)
+
+    load = commands.add_parser("load", help="Load time, peak RSS and ms/token for full, low-memory and half-precision loading")
+    load.add_argument("--model", default="Qwen/Qwen2.5-1.5B-Instruct", help="Model folder or Hugging Face id")
+    load.add_argument("--tokens", type=int, default=32, help="New tokens for the decode speed measurement")
+    load.set_defaults(func=bench_load)
+
+    quant = commands.add_parser("quantization", help="Accuracy/latency of each quantization mode vs. full precision")
+    quant.add_argument("--model", default="Qwen/Qwen2.5-1.5B-Instruct", help="Model folder or Hugging Face id")
+    quant.add_argument("--modes", nargs="+", default=list(main.QUANTIZATION_MODES), choices=main.QUANTIZATION_MODES)
+    quant.add_argument("--tokens", type=int, default=32, help="Reply tokens per prompt")
+    quant.set_defaults(func=bench_quantization)
+
+    threads = commands.add_parser("threads", help="Tokens/sec for a range of torch thread counts")
+    threads.add_argument("--model", default="Qwen/Qwen2.5-1.5B-Instruct", help="Model folder or Hugging Face id")
+    threads.add_argument("--counts", type=int, nargs="+", help="Intra-op thread counts (default: 1, 2, 4, 8 and all cores)")
+    threads.add_argument("--tokens", type=int, default=64, help="New tokens per reply")
+    threads.add_argument("--runs", type=int, default=3)
+    threads.set_defaults(func=bench_threads)
+
+    speculative = commands.add_parser("speculative", help="Decode speed with and without a draft model")
+    speculative.add_argument("--model", default="Qwen/Qwen2.5-1.5B-Instruct", help="Main model folder or Hugging Face id")
+    speculative.add_argument("--draft", default="Qwen/Qwen2.5-0.5B-Instruct", help="Draft model from the same family")
+    speculative.add_argument("--tokens", type=int, default=128, help="New tokens per reply")
+    speculative.add_argument("--runs", type=int, default=3)
+    speculative.set_defaults(func=bench_speculative)
+
+    entities = commands.add_parser("entities", help="extract_entities calls/sec (no model needed)")
+    entities.add_argument("--seconds", type=float, default=1.0, help="Minimum time per measurement")
+    entities.set_defaults(func=bench_entities)
+
+    cipher = commands.add_parser("cipher", help="Chat file cipher MB/s for several file sizes (no model needed)")
+    cipher.add_argument("--sizes", type=float, nargs="+", default=[0.01, 1, 10], help="File sizes in MB")
+    cipher.add_argument("--seconds", type=float, default=1.0, help="Minimum time per measurement")
+    cipher.set_defaults(func=bench_cipher)
+
+    chat_search = commands.add_parser("chat-search", help="Sidebar search time over a large chat store (no model needed)")
+    chat_search.add_argument("--chats", type=int, default=20000)
+    chat_search.add_argument("--messages", type=int, default=20, help="Messages per chat")
+    chat_search.add_argument("--runs", type=int, default=5)
+    chat_search.set_defaults(func=bench_chat_search)
+
+    suite = commands.add_parser("suite", help="Load, first token, decode, per-stage and chat file numbers as JSON")
+    suite.add_argument("--model", default=None, help="Model folder or Hugging Face id (default: a tiny local test model)")
+    suite.add_argument("--runs", type=int, default=5)
+    suite.add_argument("--tokens", type=int, default=64, help="New tokens per reply")
+    suite.add_argument("--seconds", type=float, default=1.0, help="Minimum time per throughput measurement")
+    suite.add_argument("--chat-messages", type=int, default=200, help="Messages in the saved/loaded chat")
+    suite.add_argument("--output", default="benchmark_results.json")
+    suite.add_argument("--compare", help="Earlier results file to show changes against")
+    suite.set_defaults(func=bench_suite)
+
+    # Used internally by "load" so every measurement starts from a fresh process
+    once = commands.add_parser("load-once")
+    once.add_argument("--model", required=True)
+    once.add_argument("--full-precision", action="store_true")
+    once.add_argument("--half-precision", action="store_true")
+    once.add_argument("--tokens", type=int, default=32)
+    once.set_defaults(func=load_once)
+
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == "__main__":
+    run()
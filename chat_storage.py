@@ -0,0 +1,40 @@
+import os
+import pickle
+
+# Reader for the chat files of earlier versions (chat_*.dat), which chat_store imports into its
+# database: a pickled dict, XOR-obfuscated with xor_cipher and prefixed with ENC_MAGIC, or (older
+# still) a plain pickle.
+ENC_MAGIC = b"ORION_ENC"
+CIPHER_KEY = b"OrionEncryptedChatV1"
+
+
+def xor_cipher(data):
+    # XOR with the key repeated over the whole buffer. Both sides are turned into one big integer
+    # so the XOR runs in C over machine words instead of a Python loop per byte; output is
+    # identical to b ^ CIPHER_KEY[i % len(CIPHER_KEY)] for every byte.
+    length = len(data)
+    if not length:
+        return b""
+    keystream = (CIPHER_KEY * (length // len(CIPHER_KEY) + 1))[:length]
+    return (int.from_bytes(data, "little") ^ int.from_bytes(keystream, "little")).to_bytes(length, "little")
+
+
+def load_chat_data(data_dir, filename):
+    filepath = os.path.join(data_dir, filename)
+    with open(filepath, "rb") as f:
+        content = f.read()
+    if content.startswith(ENC_MAGIC):
+        return pickle.loads(xor_cipher(content[len(ENC_MAGIC):]))
+    return pickle.loads(content)
+
+
+def chat_title(chat_data):
+    # Custom title if there is one, otherwise the first user message (shortened)
+    title = chat_data.get('custom_title', "New Chat")
+    if title == "New Chat":
+        for msg in chat_data.get('history', []):
+            if msg.startswith("You: "):
+                text = msg[5:].strip()
+                return text[:30] + "..." if len(text) > 30 else text
+    return title
+
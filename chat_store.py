@@ -0,0 +1,263 @@
+"""Chat store: every chat and message in one SQLite file (chats.db in the data dir).
+
+Chats have a row in `chats` (title, pinned, timestamp, model, message count) and one row per
+message in `messages`. The `chats` rows are also kept in memory, so listing chats and matching
+titles never waits for the database; message bodies are searched through an FTS5 index
+(`message_search`, kept up to date by triggers), or with LIKE if SQLite has no FTS5.
+
+Chat files from earlier versions (chat_*.dat) are imported when the store is opened. Once they
+are committed to the database they are renamed to chat_*.dat.imported, so they are not imported
+again but stay around as a backup until the chat is deleted. Unlike those files, the database
+is not obfuscated.
+"""
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+from chat_storage import chat_title, load_chat_data
+
+SCHEMA = """
+CREATE TABLE IF NOT EXISTS chats (
+    id INTEGER PRIMARY KEY, title TEXT NOT NULL, custom_title TEXT, pinned INTEGER NOT NULL DEFAULT 0,
+    timestamp REAL NOT NULL DEFAULT 0, model TEXT, message_count INTEGER NOT NULL DEFAULT 0);
+CREATE INDEX IF NOT EXISTS chats_order ON chats (pinned, timestamp);
+CREATE TABLE IF NOT EXISTS messages (
+    id INTEGER PRIMARY KEY, chat_id INTEGER NOT NULL, position INTEGER NOT NULL, text TEXT NOT NULL);
+CREATE UNIQUE INDEX IF NOT EXISTS messages_chat ON messages (chat_id, position);
+"""
+
+# External content FTS table: it indexes the rows of messages without storing a second copy
+SEARCH_SCHEMA = """
+CREATE VIRTUAL TABLE IF NOT EXISTS message_search USING fts5(text, content='messages', content_rowid='id');
+CREATE TRIGGER IF NOT EXISTS messages_insert AFTER INSERT ON messages BEGIN
+    INSERT INTO message_search (rowid, text) VALUES (new.id, new.text);
+END;
+CREATE TRIGGER IF NOT EXISTS messages_delete AFTER DELETE ON messages BEGIN
+    INSERT INTO message_search (message_search, rowid, text) VALUES ('delete', old.id, old.text);
+END;
+"""
+
+COLUMNS = "id, title, custom_title, pinned, timestamp, model, message_count"
+
+
+def _entry(row):
+    return {'id': row[0], 'title': row[1], 'custom_title': row[2], 'pinned': bool(row[3]),
+            'timestamp': row[4], 'model': row[5], 'message_count': row[6]}
+
+
+def _word_query(text):
+    # FTS5 query matching messages that contain every word of text; the last word may be
+    # unfinished (the user is still typing), so it matches as a prefix
+    words = text.split()
+    if not words:
+        return None
+    terms = ['"' + word.replace('"', '""') + '"' for word in words]
+    return " ".join(terms) + "*"
+
+
+class ChatStore:
+    # Saves are incremental: the messages of the chats saved or loaded most recently are
+    # remembered, so a save only inserts the messages added since (or rewrites from the first
+    # changed one). Used from the GUI thread, the title thread and the sidebar search thread,
+    # hence the lock.
+    def __init__(self, data_dir, filename="chats.db", cache_size=16):
+        self.data_dir = data_dir
+        self.path = os.path.join(data_dir, filename)
+        self.cache_size = cache_size
+        self.histories = OrderedDict()  # chat id -> copy of the messages as stored
+        self.ordered = None  # self.entries sorted for listing, until the next change
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(self.path, check_same_thread=False)
+        self.connection.executescript(SCHEMA)
+        try:
+            self.connection.executescript(SEARCH_SCHEMA)
+            self.full_text = True
+        except sqlite3.OperationalError:
+            self.full_text = False  # SQLite built without FTS5
+        self.entries = {row[0]: _entry(row) for row in self.connection.execute(f"SELECT {COLUMNS} FROM chats")}
+        self.imported = self.migrate()  # Chats imported from older versions just now
+
+    def migrate(self):
+        # Import chat_*.dat files from earlier versions; returns how many were imported
+        try:
+            files = os.listdir(self.data_dir)
+        except OSError:
+            return 0
+        imported = []
+        with self.lock, self.connection:  # One transaction, so nothing is renamed before it's committed
+            for filename in files:
+                if not (filename.startswith('chat_') and filename.endswith('.dat')):
+                    continue
+                try:
+                    chat_id = int(filename[5:-4])
+                    chat_data = load_chat_data(self.data_dir, filename)
+                except Exception:
+                    continue  # Left in place: unreadable, but maybe not by a later version
+                self._save(chat_id, chat_data)
+                imported.append(filename)
+        count = len(imported)
+        if imported:
+            # The metadata index of the file-based chats isn't needed anymore either
+            imported.append("chat_index.json")
+        for filename in imported:
+            path = os.path.join(self.data_dir, filename)
+            try:
+                os.replace(path, path + ".imported")
+            except OSError:
+                pass
+        return count
+
+    def _remove_backups(self, chat_id=None):
+        # Delete the imported chat file of chat_id (of every chat if None), so deleted chats don't
+        # stay on disk
+        try:
+            files = os.listdir(self.data_dir)
+        except OSError:
+            return
+        if chat_id is not None:
+            files = [name for name in files if name == f"chat_{chat_id}.dat.imported"]
+        else:
+            files = [name for name in files if name.startswith('chat_') and name.endswith('.imported')]
+        for filename in files:
+            try:
+                os.remove(os.path.join(self.data_dir, filename))
+            except OSError:
+                pass
+
+    def _remember(self, chat_id, history):
+        self.histories[chat_id] = list(history)
+        self.histories.move_to_end(chat_id)
+        while len(self.histories) > self.cache_size:
+            self.histories.popitem(last=False)
+
+    def _stored_history(self, chat_id):
+        if chat_id in self.histories:
+            return self.histories[chat_id]
+        rows = self.connection.execute("SELECT text FROM messages WHERE chat_id = ? ORDER BY position", (chat_id,))
+        return [row[0] for row in rows]
+
+    def _save(self, chat_id, chat_data):
+        # Called with the lock held, inside a transaction
+        history = chat_data.get('history', [])
+        stored = self._stored_history(chat_id)
+        if len(history) >= len(stored) and history[:len(stored)] == stored:
+            first_changed = len(stored)
+        else:
+            first_changed = 0
+            while (first_changed < min(len(history), len(stored))
+                   and history[first_changed] == stored[first_changed]):
+                first_changed += 1
+        if first_changed < len(stored):
+            self.connection.execute("DELETE FROM messages WHERE chat_id = ? AND position >= ?", (chat_id, first_changed))
+        self.connection.executemany("INSERT INTO messages (chat_id, position, text) VALUES (?, ?, ?)",
+                                    ((chat_id, position, history[position]) for position in range(first_changed, len(history))))
+
+        entry = {'id': chat_id, 'title': chat_title(chat_data), 'custom_title': chat_data.get('custom_title'),
+                 'pinned': bool(chat_data.get('pinned', False)), 'timestamp': chat_data.get('timestamp', 0),
+                 'model': chat_data.get('model'), 'message_count': len(history)}
+        self.connection.execute(
+            f"INSERT INTO chats ({COLUMNS}) VALUES (?, ?, ?, ?, ?, ?, ?) "
+            "ON CONFLICT (id) DO UPDATE SET title = excluded.title, custom_title = excluded.custom_title, "
+            "pinned = excluded.pinned, timestamp = excluded.timestamp, model = excluded.model, "
+            "message_count = excluded.message_count",
+            tuple(entry.values()))
+        self._remember(chat_id, history)
+        self.entries[chat_id] = entry
+        self.ordered = None
+
+    def save(self, chat_id, chat_data):
+        # Store a chat dict ('history', 'model', 'timestamp', optional 'custom_title' and 'pinned')
+        with self.lock, self.connection:
+            self._save(chat_id, chat_data)
+
+    def load(self, chat_id):
+        # The chat dict as it was saved; KeyError if there is no such chat
+        with self.lock:
+            entry = self.entries[chat_id]
+            history = self._stored_history(chat_id)
+            self._remember(chat_id, history)
+        chat_data = {'history': list(history), 'model': entry['model'], 'timestamp': entry['timestamp'],
+                     'pinned': entry['pinned']}
+        if entry['custom_title'] is not None:
+            chat_data['custom_title'] = entry['custom_title']
+        return chat_data
+
+    def update(self, chat_id, custom_title=None, pinned=None):
+        # Rename or (un)pin a chat without touching its messages
+        with self.lock, self.connection:
+            entry = self.entries.get(chat_id)
+            if entry is None:
+                return
+            if custom_title is not None:
+                self.connection.execute("UPDATE chats SET custom_title = ?, title = ? WHERE id = ?",
+                                        (custom_title, custom_title, chat_id))
+                entry['custom_title'] = entry['title'] = custom_title
+            if pinned is not None:
+                self.connection.execute("UPDATE chats SET pinned = ? WHERE id = ?", (int(pinned), chat_id))
+                entry['pinned'] = bool(pinned)
+            self.ordered = None
+
+    def delete(self, chat_id):
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM messages WHERE chat_id = ?", (chat_id,))
+            self.connection.execute("DELETE FROM chats WHERE id = ?", (chat_id,))
+            self.histories.pop(chat_id, None)
+            deleted = self.entries.pop(chat_id, None) is not None
+            self.ordered = None
+        self._remove_backups(chat_id)
+        return deleted
+
+    def clear(self):
+        # Delete every chat; returns how many there were
+        with self.lock, self.connection:
+            self.connection.execute("DELETE FROM messages")
+            self.connection.execute("DELETE FROM chats")
+            self.histories.clear()
+            deleted = len(self.entries)
+            self.entries = {}
+            self.ordered = None
+        self._remove_backups()
+        return deleted
+
+    def get(self, chat_id):
+        # Metadata of a chat (no messages), or None
+        with self.lock:
+            entry = self.entries.get(chat_id)
+            return dict(entry) if entry else None
+
+    def __len__(self):
+        return len(self.entries)
+
+    def list(self, filter_text="", search_messages=True):
+        # Metadata of the chats whose title contains filter_text (case-insensitively) or, with
+        # search_messages, whose messages contain its words; pinned first, then newest first
+        filter_text = filter_text.strip().lower()
+        message_matches = self._message_matches(filter_text) if filter_text and search_messages else ()
+        with self.lock:
+            if self.ordered is None:
+                self.ordered = sorted(self.entries.values(), key=lambda entry: (entry['pinned'], entry['timestamp']), reverse=True)
+            return [dict(entry) for entry in self.ordered
+                    if not filter_text or filter_text in entry['title'].lower() or entry['id'] in message_matches]
+
+    def _message_matches(self, text):
+        # Ids of the chats with a message matching text
+        query = _word_query(text)
+        if self.full_text and query:
+            sql = ("SELECT DISTINCT chat_id FROM messages WHERE id IN "
+                   "(SELECT rowid FROM message_search WHERE message_search MATCH ?)")
+            params = (query,)
+        else:
+            sql, params = "SELECT DISTINCT chat_id FROM messages WHERE text LIKE ? ESCAPE '\\'", (self._like(text),)
+        with self.lock:
+            return {row[0] for row in self.connection.execute(sql, params)}
+
+    def _like(self, text):
+        escaped = text.replace('\\', '\\\\').replace('%', '\\%').replace('_', '\\_')
+        return f"%{escaped}%"
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
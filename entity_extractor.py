@@ -0,0 +1,101 @@
+import re
+
+# Gazetteers for extract_entities; matched case-insensitively on word boundaries
+MONTHS = ["January", "February", "March", "April", "May", "June", "July", "August", "September",
+          "October", "November", "December"]
+
+LOCATIONS = ["Paris", "London", "Tokyo", "New York", "Berlin", "Madrid", "Rome", "Amsterdam", "Vienna", "Prague",
+             "Budapest", "Warsaw", "Cairo", "Dubai", "Singapore", "Seoul", "Mumbai", "Delhi", "Bangalore", "Chennai",
+             "Hyderabad", "Pune", "Ahmedabad", "Jaipur", "Surat", "Kanpur", "Nagpur", "Lucknow", "Ghaziabad", "Indore",
+             "Coimbatore", "Kochi", "Kozhikode", "Thrissur", "Malappuram", "Palakkad", "Kollam", "Thiruvananthapuram",
+             "Kannur", "Alappuzha", "Kottayam", "Pathanamthitta", "Idukki", "Ernakulam", "Wayanad"]
+
+TECHNOLOGIES = ["Python", "JavaScript", "Java", "C++", "C#", "Ruby", "PHP", "Swift", "Kotlin", "Go", "Rust", "TypeScript",
+                "React", "Angular", "Vue", "Node.js", "Django", "Flask", "Spring", "Laravel", "Express", "TensorFlow",
+                "PyTorch", "Scikit-learn", "Pandas", "NumPy", "Matplotlib", "Seaborn", "Plotly", "Jupyter", "Colab", "Git",
+                "GitHub", "Docker", "Kubernetes", "AWS", "Azure", "GCP", "MongoDB", "PostgreSQL", "MySQL", "Redis",
+                "Elasticsearch", "Kafka", "RabbitMQ", "Nginx", "Apache", "Linux", "Ubuntu", "CentOS", "macOS", "Windows",
+                "iOS", "Android"]
+
+
+def word_alternation(words):
+    # Regex for "any of these words", laid out as a trie: the engine only follows branches that
+    # match the next character, where a flat alternation tries every word at every position.
+    # Of two words sharing a prefix the longer one is tried first.
+    trie = {}
+    for word in words:
+        node = trie
+        for char in word.lower():
+            node = node.setdefault(char, {})
+        node[''] = {}  # End of a word
+
+    def build(node):
+        branches = [re.escape(char) + build(child) for char, child in node.items() if char]
+        if not branches:
+            return ''
+        pattern = branches[0] if len(branches) == 1 else '(?:' + '|'.join(branches) + ')'
+        if '' in node:
+            pattern = '(?:' + pattern + ')?'
+        return pattern
+
+    return build(trie)
+
+
+# Dates written with month names, cities and technologies can never overlap each other, so one
+# case-insensitive scan finds all three (the group name is the entity type). ASCII text is
+# lowercased and matched without IGNORECASE, which lets the engine skip non-matching branches
+# after one character compare; lowercasing can change the length of other text, so it uses
+# the IGNORECASE version.
+_GAZETTEER_SOURCE = (
+    r'\b(?:(?P<month_date>' + word_alternation(MONTHS) + r')\s+\d{1,2},?\s+\d{4}\b'
+    r'|(?P<location>' + word_alternation(LOCATIONS) + r')\b'
+    r'|(?P<technology>' + word_alternation(TECHNOLOGIES) + r')\b)')
+GAZETTEER_PATTERN = re.compile(_GAZETTEER_SOURCE)
+GAZETTEER_PATTERN_IGNORECASE = re.compile(_GAZETTEER_SOURCE, re.IGNORECASE)
+
+# Numeric dates and times can overlap each other (a time is also found inside "10:30 AM" as "30 AM"),
+# so they keep a scan each. None of them can match without a digit.
+NUMERIC_DATE_PATTERNS = [
+    re.compile(r'\b\d{1,2}/\d{1,2}/\d{4}\b', re.IGNORECASE),  # MM/DD/YYYY or DD/MM/YYYY
+    re.compile(r'\b\d{4}-\d{1,2}-\d{1,2}\b', re.IGNORECASE),  # YYYY-MM-DD
+]
+TIME_PATTERNS = [
+    re.compile(r'\b\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM|am|pm)?\b', re.IGNORECASE),
+    re.compile(r'\b\d{1,2}\s*(?:AM|PM|am|pm)\b', re.IGNORECASE),
+]
+DIGIT_PATTERN = re.compile(r'\d')
+
+PERSON_PATTERN = re.compile(r'\b[A-Z][a-z]+\s+[A-Z][a-z]+\b')  # First Last name pattern
+
+
+def extract_entities(text):
+    # Dates, times, locations, person names and technologies in text, as
+    # {'type', 'value', 'text'} dicts grouped by type in that order
+    dates, times = [], []
+    if DIGIT_PATTERN.search(text):
+        for pattern in NUMERIC_DATE_PATTERNS:
+            dates.extend(pattern.findall(text))
+        for pattern in TIME_PATTERNS:
+            times.extend(pattern.findall(text))
+
+    locations, technologies = [], []
+    if text.isascii():
+        matches = GAZETTEER_PATTERN.finditer(text.lower())
+    else:
+        matches = GAZETTEER_PATTERN_IGNORECASE.finditer(text)
+    for match in matches:
+        value = text[match.start():match.end()]  # As written in the original text
+        kind = match.lastgroup
+        if kind == 'location':
+            locations.append(value)
+        elif kind == 'technology':
+            technologies.append(value)
+        else:
+            dates.append(value)
+
+    entities = [{'type': 'date', 'value': value, 'text': text} for value in dates]
+    entities += [{'type': 'time', 'value': value, 'text': text} for value in times]
+    entities += [{'type': 'location', 'value': value, 'text': text} for value in locations]
+    entities += [{'type': 'person', 'value': value, 'text': text} for value in PERSON_PATTERN.findall(text)]
+    entities += [{'type': 'technology', 'value': value, 'text': text} for value in technologies]
+    return entities
@@ -0,0 +1,122 @@
+import json
+import re
+from functools import lru_cache
+
+# Built-in intents for guided conversations, in priority order (earlier wins a tie)
+DEFAULT_INTENTS = {
+    'restaurant': ['restaurant', 'food', 'eat', 'dinner', 'lunch', 'breakfast', 'hungry', 'meal'],
+    'weather': ['weather', 'temperature', 'rain', 'sunny', 'cloudy', 'forecast'],
+    'directions': ['directions', 'where', 'location', 'address', 'map', 'navigate'],
+    'shopping': ['buy', 'purchase', 'shop', 'store', 'price', 'cost'],
+    'booking': ['book', 'reserve', 'appointment', 'schedule', 'ticket'],
+    'learning': ['learn', 'study', 'course', 'tutorial', 'teach', 'explain'],
+    'travel': ['travel', 'flight', 'hotel', 'vacation', 'trip', 'journey'],
+    'health': ['health', 'doctor', 'medicine', 'symptom', 'pain', 'sick'],
+    'finance': ['money', 'bank', 'account', 'budget', 'investment', 'loan'],
+}
+
+TOKEN_PATTERN = re.compile(r"[\w']+")
+
+# Inflection endings stripped to find a keyword's base form: ending -> what replaces it
+SUFFIXES = (('ies', 'y'), ('ied', 'y'), ('es', ''), ('s', ''), ('ing', ''), ('ed', ''))
+
+
+def tokenize(text):
+    return TOKEN_PATTERN.findall(text.lower())
+
+
+@lru_cache(maxsize=4096)
+def word_forms(word):
+    # The word followed by the base forms it may be an inflection of: "raining" -> "rain",
+    # "shopping" -> "shop", "priced" -> "price", "studies" -> "study". Bases shorter than three
+    # letters are skipped, so "sing" is not "s" + "ing". Cached, as most words recur.
+    forms = [word]
+    for suffix, replacement in SUFFIXES:
+        base = word[:-len(suffix)]
+        if not word.endswith(suffix) or len(base) < 3:
+            continue
+        forms.append(base + replacement)
+        if suffix in ('ing', 'ed'):
+            if base[-1] == base[-2]:
+                forms.append(base[:-1])  # Doubled consonant
+            forms.append(base + 'e')  # Dropped e
+    return tuple(forms)
+
+
+def load_intent_vocabulary(path):
+    # Extra intent keywords from a JSON file: {"intent": ["keyword", "multi word phrase", ...]}.
+    # A missing file is an empty vocabulary.
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            vocabulary = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Could not load intent vocabulary {path}: {e}")
+        return {}
+    if not isinstance(vocabulary, dict):
+        print(f"Could not load intent vocabulary {path}: expected a JSON object")
+        return {}
+    return {intent: [keyword for keyword in keywords if isinstance(keyword, str)]
+            for intent, keywords in vocabulary.items() if isinstance(keywords, list)}
+
+
+class IntentIndex:
+    # Keywords mapped to the intents they indicate. Classifying a message is one pass over its
+    # tokens: a dict lookup per word, plus phrase lookups at words that start a multi-word keyword,
+    # so the cost doesn't depend on how many intents or keywords there are. Keywords only match
+    # whole words, in any inflection (see word_forms): "raining" matches "rain" and "symptoms"
+    # matches "symptom", but "nowhere" doesn't match "where".
+    def __init__(self, intents=None):
+        self.words = {}  # single-word keyword -> list of intents
+        self.phrases = {}  # multi-word keyword as a token tuple -> list of intents
+        self.phrase_starts = set()  # First words of multi-word keywords
+        self.priority = {}  # intent -> order it was added in, for breaking ties
+        self.max_length = 1
+        for intent, keywords in (intents or {}).items():
+            self.add(intent, keywords)
+
+    def add(self, intent, keywords):
+        self.priority.setdefault(intent, len(self.priority))
+        for keyword in keywords:
+            phrase = tuple(tokenize(keyword))
+            if not phrase:
+                continue
+            if len(phrase) == 1:
+                intents = self.words.setdefault(phrase[0], [])
+            else:
+                intents = self.phrases.setdefault(phrase, [])
+                self.phrase_starts.add(phrase[0])
+                self.max_length = max(self.max_length, len(phrase))
+            if intent not in intents:
+                intents.append(intent)
+
+    def _lookup(self, table, key, last):
+        # Intents of key, trying the base forms of its last word if it isn't a keyword as it is
+        for form in word_forms(last):
+            intents = table.get(form if isinstance(key, str) else key[:-1] + (form,))
+            if intents is not None:
+                return intents
+        return None
+
+    def scores(self, text):
+        # intent -> score; each matching keyword adds its length in words, so phrases count more
+        tokens = tokenize(text)
+        scores = {}
+        for start, token in enumerate(tokens):
+            for intent in self._lookup(self.words, token, token) or ():
+                scores[intent] = scores.get(intent, 0) + 1
+            if token not in self.phrase_starts:
+                continue
+            for length in range(2, min(self.max_length, len(tokens) - start) + 1):
+                phrase = tuple(tokens[start:start + length])
+                for intent in self._lookup(self.phrases, phrase, phrase[-1]) or ():
+                    scores[intent] = scores.get(intent, 0) + length
+        return scores
+
+    def classify(self, text, default='general'):
+        # Highest scoring intent; ties go to the intent added first
+        scores = self.scores(text)
+        if not scores:
+            return default
+        return max(scores, key=lambda intent: (scores[intent], -self.priority[intent]))
@@ -23,12 +23,17 @@ except ImportError:
     pass
 
 try:
-    from main import OrionChatbot
+    from main import OrionChatbot, QUANTIZATION_MODES
+    from model_registry import default_memory_budget
+    from chat_store import ChatStore
     ORION_AVAILABLE = True
 except ImportError as e:
     ORION_AVAILABLE = False
     print(f"Warning: Could not import OrionChatbot: {e}")
 
+CHAT_SEARCH_DELAY_MS = 250  # Pause in typing before the sidebar search runs
+CHAT_LIST_PAGE = 100  # Sidebar rows shown at once; "Show more" adds another page
+
 class OrionGUI:
     def __init__(self):
         if not ORION_AVAILABLE:
@@ -87,6 +92,14 @@ class OrionGUI:
         self.thinking_var = ctk.BooleanVar(value=True)
         self.typing_speed_var = ctk.IntVar(value=15)
         self.strict_mode_var = ctk.BooleanVar(value=False)
+        self.context_budget_var = ctk.IntVar(value=2048)
+        self.batching_var = ctk.BooleanVar(value=True)
+        self.low_memory_var = ctk.BooleanVar(value=True)
+        self.half_precision_var = ctk.BooleanVar(value=False)
+        self.inference_threads_var = ctk.IntVar(value=0)
+        self.persist_cache_var = ctk.BooleanVar(value=False)
+        self.trace_logging_var = ctk.BooleanVar(value=False)
+        self.model_memory_var = ctk.IntVar(value=max(1, default_memory_budget() // 1024 ** 3))
         self.startup_greeting_var = ctk.StringVar(value="Hello! I am Orion, an AI chatbot created by OmniNode. How can I help you today?")
         self.system_prompt = ""
         self.last_interaction_time = 0
@@ -95,6 +108,10 @@ class OrionGUI:
         self.sidebar_collapsed = False
         self.current_chat_id = None
         self.chat_history_data = []
+        self.streaming_label = None  # Orion bubble currently receiving streamed tokens
+        self.streaming_index = None
+        self.streaming_text = ""
+        self.data_dir = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), '.orion')
 
         # Start background initialization
         threading.Thread(target=self.run_initialization, daemon=True).start()
@@ -120,7 +137,7 @@ class OrionGUI:
             time.sleep(0.3) # Aesthetic delay
             
         try:
-            self.orion = OrionChatbot() # This acts as the heavy lifting
+            self.orion = OrionChatbot(**self.load_model_settings()) # This acts as the heavy lifting
             if not self.orion.llm:
                  self.root.after(0, lambda: self.update_loading_status("AI Engine failed to load. Running in legacy mode.", 0.9))
                  time.sleep(1)
@@ -142,12 +159,29 @@ class OrionGUI:
         except Exception:
             pass
 
+    def load_model_settings(self):
+        # The saved settings that decide how the startup model is loaded, as OrionChatbot arguments.
+        # They are needed before the model loads; load_settings applies the rest once the UI exists.
+        try:
+            with open(os.path.join(self.data_dir, 'orion_settings.json'), 'r') as f:
+                settings = json.load(f)
+            return {
+                'intra_op_threads': max(0, int(settings.get('inference_threads', 0))),
+                'inter_op_threads': max(0, int(settings.get('interop_threads', 0))),
+                'low_memory_loading': bool(settings.get('low_memory_loading', True)),
+                'half_precision': bool(settings.get('half_precision', False)),
+            }
+        except Exception:
+            return {}  # Defaults; load_settings reports a broken settings file
+
     def complete_ui_setup(self):
-        # Define data directory
-        self.data_dir = os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), '.orion')
+        # Create the data directory
         if not os.path.exists(self.data_dir):
             os.makedirs(self.data_dir)
 
+        # All chats and their messages (imports chat files from older versions)
+        self.chat_store = ChatStore(self.data_dir)
+
         # Load saved settings
         self.load_settings()
 
@@ -205,11 +239,20 @@ class OrionGUI:
         # Search bar
         self.search_entry = ctk.CTkEntry(self.sidebar_frame, placeholder_text="Search chats...")
         self.search_entry.pack(fill="x", padx=5, pady=(0, 5))
-        self.search_entry.bind("<KeyRelease>", lambda event: self.refresh_chat_list())
+        self.search_entry.bind("<KeyRelease>", lambda event: self.schedule_chat_search())
 
-        # Chat list (scrollable)
+        # Chat list (scrollable). Rows are pooled buttons that get reused when the list changes,
+        # and only the first chat_list_limit matches are shown.
         self.chat_list = ctk.CTkScrollableFrame(self.sidebar_frame)
         self.chat_list.pack(fill="both", expand=True, padx=5, pady=5)
+        self.chat_rows = []
+        self.chat_rows_shown = 0
+        self.chat_list_limit = CHAT_LIST_PAGE
+        self.chat_list_results = []
+        self.chat_search_after = None
+        self.chat_search_generation = 0
+        self.show_more_button = ctk.CTkButton(self.chat_list, text="Show more", command=self.show_more_chats,
+                                              fg_color="transparent", border_width=1, text_color=("gray10", "gray90"))
 
         # Load existing chat buttons
         self.refresh_chat_list()
@@ -271,6 +314,10 @@ class OrionGUI:
         
         # Initial greeting
         self.add_to_history(f"Orion: {self.startup_greeting_var.get()}\n", animate=True)  
+        if self.chat_store.imported:
+            self.add_to_history(f"Orion: Imported {self.chat_store.imported} chats from an older version into chats.db. "
+                                "The database is not obfuscated like the old chat files were; the old files are kept "
+                                "as chat_*.dat.imported until you delete those chats.\n")
 
     def on_closing(self):
         self.running = False
@@ -415,12 +462,49 @@ class OrionGUI:
         strict_check = ctk.CTkCheckBox(behavior_tab, text="Strict Command Mode (Disable auto-actions)", variable=self.strict_mode_var)
         strict_check.pack(pady=5)
 
+        # Continuous batching
+        batching_check = ctk.CTkCheckBox(behavior_tab, text="Continuous batching (run concurrent requests together)", variable=self.batching_var)
+        batching_check.pack(pady=5)
+
+        # Low-memory model loading; it only trims the peak while loading, the model stays float32
+        low_memory_check = ctk.CTkCheckBox(behavior_tab, text="Low-memory model loading (no temporary copies, weights stay float32)", variable=self.low_memory_var)
+        low_memory_check.pack(pady=5)
+
+        # Half-precision weights: the only setting that makes the loaded model smaller (GGUF included)
+        half_precision_check = ctk.CTkCheckBox(behavior_tab, text="Half-precision weights (half the model RAM, slower on most CPUs)", variable=self.half_precision_var)
+        half_precision_check.pack(pady=5)
+
         # Typing Speed
         speed_label = ctk.CTkLabel(behavior_tab, text="Typing Speed (ms delay - lower is faster):")
         speed_label.pack(pady=(20, 5))
         speed_slider = ctk.CTkSlider(behavior_tab, from_=1, to=100, variable=self.typing_speed_var, number_of_steps=99)
         speed_slider.pack(pady=5)
 
+        # Context budget
+        context_label = ctk.CTkLabel(behavior_tab, text="Context Budget (tokens of chat history sent to the model):")
+        context_label.pack(pady=(20, 5))
+        context_slider = ctk.CTkSlider(behavior_tab, from_=512, to=8192, variable=self.context_budget_var, number_of_steps=15)
+        context_slider.pack(pady=5)
+        context_value_label = ctk.CTkLabel(behavior_tab, textvariable=self.context_budget_var)
+        context_value_label.pack(pady=5)
+
+        # Model memory budget
+        memory_label = ctk.CTkLabel(behavior_tab, text="Model Memory (GB kept loaded for quick model switching):")
+        memory_label.pack(pady=(20, 5))
+        memory_slider = ctk.CTkSlider(behavior_tab, from_=1, to=64, variable=self.model_memory_var, number_of_steps=63)
+        memory_slider.pack(pady=5)
+        memory_value_label = ctk.CTkLabel(behavior_tab, textvariable=self.model_memory_var)
+        memory_value_label.pack(pady=5)
+
+        # Inference threads
+        threads_label = ctk.CTkLabel(behavior_tab, text="Inference Threads (0 = automatic):")
+        threads_label.pack(pady=(20, 5))
+        max_threads = os.cpu_count() or 1
+        threads_slider = ctk.CTkSlider(behavior_tab, from_=0, to=max_threads, variable=self.inference_threads_var, number_of_steps=max_threads)
+        threads_slider.pack(pady=5)
+        threads_value_label = ctk.CTkLabel(behavior_tab, textvariable=self.inference_threads_var)
+        threads_value_label.pack(pady=5)
+
         # Data Management Tab
         tabview.add("Data")
         data_tab = tabview.tab("Data")
@@ -433,12 +517,24 @@ class OrionGUI:
         clear_button = ctk.CTkButton(data_tab, text="Clear All Chat History", fg_color="red", command=self.clear_all_chats)
         clear_button.pack(pady=10)
 
+        # Response cache
+        persist_cache_check = ctk.CTkCheckBox(data_tab, text="Keep cached code/title answers on disk", variable=self.persist_cache_var)
+        persist_cache_check.pack(pady=5)
+        clear_cache_button = ctk.CTkButton(data_tab, text="Clear Response Cache", command=self.orion.response_cache.clear)
+        clear_cache_button.pack(pady=5)
+
+        # Per-reply latency breakdown (also available with /trace)
+        trace_logging_check = ctk.CTkCheckBox(data_tab, text="Log reply timings to traces.jsonl", variable=self.trace_logging_var)
+        trace_logging_check.pack(pady=5)
+
         # Chat statistics
         stats_label = ctk.CTkLabel(data_tab, text="Chat Statistics:")
         stats_label.pack(pady=(20, 5))
-        chat_count = len([f for f in os.listdir(self.data_dir) if f.startswith('chat_') and f.endswith('.dat')])
+        chat_count = len(self.chat_store)
         stats_text = ctk.CTkLabel(data_tab, text=f"Total chats: {chat_count}")
         stats_text.pack(pady=5)
+        storage_text = ctk.CTkLabel(data_tab, text="Chats are stored unencrypted in chats.db in the .orion folder.")
+        storage_text.pack(pady=5)
 
         # Delete .orion folder button
         delete_data_button = ctk.CTkButton(data_tab, text="Delete .orion Folder", fg_color="red", hover_color="darkred", command=self.delete_orion_folder)
@@ -535,26 +631,6 @@ Built with Python and CustomTkinter."""
 
         threading.Thread(target=run_check, daemon=True).start()
 
-    def _xor_cipher(self, data):
-        key = b"OrionEncryptedChatV1"
-        key_len = len(key)
-        return bytes([b ^ key[i % key_len] for i, b in enumerate(data)])
-
-    def _load_chat_data(self, filename):
-        filepath = os.path.join(self.data_dir, filename)
-        with open(filepath, "rb") as f:
-            content = f.read()
-        if content.startswith(b"ORION_ENC"):
-            return pickle.loads(self._xor_cipher(content[9:]))
-        return pickle.loads(content)
-
-    def _save_chat_data(self, filename, data):
-        filepath = os.path.join(self.data_dir, filename)
-        serialized = pickle.dumps(data)
-        encrypted = self._xor_cipher(serialized)
-        with open(filepath, "wb") as f:
-            f.write(b"ORION_ENC" + encrypted)
-
     def parse_version(self, version_str):
         try:
             # Extract just the numbers X.Y.Z from string
@@ -695,10 +771,18 @@ Built with Python and CustomTkinter."""
                         status_badge = ctk.CTkLabel(row, text="● ACTIVE", text_color="#28a745", font=("Arial", 10, "bold"))
                         status_badge.pack(side="left", padx=10)
                         name_label.configure(text_color="#28a745")
+                    elif path in self.orion.model_registry:
+                        status_badge = ctk.CTkLabel(row, text="◐ IN MEMORY", text_color="#00ffcc", font=("Arial", 10))
+                        status_badge.pack(side="left", padx=10)
                     else:
                         status_badge = ctk.CTkLabel(row, text="○ UNLOADED", text_color="gray", font=("Arial", 10))
                         status_badge.pack(side="left", padx=10)
 
+                    # Weight format for this model, stored in its folder
+                    quant_menu = ctk.CTkOptionMenu(row, values=list(QUANTIZATION_MODES), width=70, command=lambda mode, p=path: self.set_model_quantization(p, mode))
+                    quant_menu.set(self.orion.get_model_quantization(path))
+                    quant_menu.pack(side="right", padx=5)
+
                     # Pass full path to loader
                     load_btn = ctk.CTkButton(row, text="Load", width=60, command=lambda p=path: self.load_local_model(p))
                     load_btn.pack(side="right", padx=5)
@@ -733,10 +817,17 @@ Built with Python and CustomTkinter."""
                         status_badge = ctk.CTkLabel(row, text="● ACTIVE", text_color="#28a745", font=("Arial", 10, "bold"))
                         status_badge.pack(side="left", padx=10)
                         name_label.configure(text_color="#28a745")
+                    elif repo.repo_id in self.orion.model_registry:
+                        status_badge = ctk.CTkLabel(row, text="◐ IN MEMORY", text_color="#00ffcc", font=("Arial", 10))
+                        status_badge.pack(side="left", padx=10)
                     else:
                         status_badge = ctk.CTkLabel(row, text="○ UNLOADED", text_color="gray", font=("Arial", 10))
                         status_badge.pack(side="left", padx=10)
 
+                    quant_menu = ctk.CTkOptionMenu(row, values=list(QUANTIZATION_MODES), width=70, command=lambda mode, mid=repo.repo_id: self.set_model_quantization(mid, mode))
+                    quant_menu.set(self.orion.get_model_quantization(repo.repo_id))
+                    quant_menu.pack(side="right", padx=5)
+
                     load_btn = ctk.CTkButton(row, text="Load", width=60, command=lambda mid=repo.repo_id: self.load_local_model(mid))
                     load_btn.pack(side="right", padx=5)
                     if is_active:
@@ -780,6 +871,10 @@ Built with Python and CustomTkinter."""
                      self.root.after(0, lambda: self.add_to_history(f"System: Cannot delete active model {name}. Load another model first.\n"))
                      return
 
+            # Don't keep serving a model whose files are gone
+            self.orion.model_registry.remove(path_str)
+            self.orion.model_registry.remove(name)
+
             if os.path.exists(path):
                 # Helper for windows read-only files
                 def remove_readonly(func, path, _):
@@ -987,6 +1082,16 @@ Built with Python and CustomTkinter."""
 
         threading.Thread(target=run_install, daemon=True).start()
 
+    def set_model_quantization(self, path_or_id, mode):
+        try:
+            self.orion.set_model_quantization(path_or_id, mode)
+        except Exception as e:
+            self.add_to_history(f"System: Could not save quantization setting: {e}\n")
+            return
+        self.add_to_history(f"System: {path_or_id} will use {mode} weights.\n")
+        if self.orion.model_name == path_or_id:
+            self.load_local_model(path_or_id)  # Reload so the active model picks it up
+
     def load_local_model(self, path_or_id):
         self.add_to_history(f"System: Switching to model {path_or_id}...\n")
         
@@ -1081,17 +1186,12 @@ Built with Python and CustomTkinter."""
 
         if title:
             try:
-                # Update chat file
-                # Wait briefly to ensure file is created/accessible
+                # Update the stored chat
+                # Wait briefly to ensure the chat has been saved
                 time.sleep(1)
                 
-                filepath = os.path.join(self.data_dir, f"chat_{chat_id}.dat")
-                if os.path.exists(filepath):
-                    chat_data = self._load_chat_data(f"chat_{chat_id}.dat")
-                    
-                    chat_data['custom_title'] = title
-                    
-                    self._save_chat_data(f"chat_{chat_id}.dat", chat_data)
+                if self.chat_store.get(chat_id) is not None:
+                    self.chat_store.update(chat_id, custom_title=title)
                     
                     self.root.after(0, self.refresh_chat_list)
             except Exception as e:
@@ -1099,6 +1199,14 @@ Built with Python and CustomTkinter."""
 
     def cancel_generation(self):
         self.generation_cancelled = True
+        # Keep whatever part of a streamed reply was already shown
+        if self.streaming_label is not None:
+            self.chat_history_data[self.streaming_index] = f"Orion: {self.streaming_text}\n"
+            try:
+                self.streaming_label.configure(text=self.streaming_text)
+            except Exception:
+                pass
+            self.streaming_label = None
         self.progress_bar.stop()
         self.progress_bar.configure(mode="determinate")
         self.thinking_frame.pack_forget()
@@ -1124,7 +1232,7 @@ Built with Python and CustomTkinter."""
         self.chat_history_data.append(text)
 
         # Create message bubble with index
-        self.create_message_bubble(sender, message, index, animate)
+        return self.create_message_bubble(sender, message, index, animate)
 
     def create_message_bubble(self, sender, message, index, animate=False):
         # Create a frame for the bubble
@@ -1136,6 +1244,7 @@ Built with Python and CustomTkinter."""
             # Extract URL and display image
             image_url = message[11:].strip()  # Remove "IMAGE_URL: " prefix
             self.display_image_bubble(bubble_frame, image_url, index)
+            return None
         else:
             # Create the message label
             if sender == "user":
@@ -1164,6 +1273,7 @@ Built with Python and CustomTkinter."""
                 msg_label.pack(anchor="center", padx=10, pady=5)
                 # Bind right-click to show context menu
                 msg_label.bind("<Button-3>", lambda event, idx=index: self.show_message_context_menu(event, idx))
+            return msg_label
 
     def animate_typing(self, label, text, index=0):
         try:
@@ -1265,14 +1375,60 @@ Built with Python and CustomTkinter."""
         # Update Ollama model in Orion instance
         self.orion.ollama_model = self.ollama_model_var.get()
 
-        # Get response with current model
-        response = self.orion.get_response(user_input, self.current_model, image_data)
+        # Commands and the legacy keyword fallback answer in one piece
+        if user_input.startswith('/') or not self.orion.llm:
+            response = self.orion.get_response(user_input, self.current_model, image_data)
+
+            if self.generation_cancelled:
+                return
+
+            # Use after() to update UI from the main thread
+            self.root.after(0, lambda: self.show_response(response))
+            return
+
+        # Stream AI replies into their bubble as tokens are generated
+        stream = self.orion.stream_response(user_input, self.current_model, image_data)
+        response = ""
+        try:
+            for piece in stream:
+                if self.generation_cancelled:
+                    break
+                if not response:
+                    self.root.after(0, self.begin_streamed_response)
+                response += piece
+                self.root.after(0, lambda text=response: self.update_streamed_response(text))
+        finally:
+            # Closing the stream stops generation if we bailed out early
+            stream.close()
 
         if self.generation_cancelled:
             return
 
-        # Use after() to update UI from the main thread
-        self.root.after(0, lambda: self.show_response(response))
+        self.root.after(0, lambda: self.show_response(response, streamed=True))
+
+    def begin_streamed_response(self):
+        if self.generation_cancelled:
+            return
+        # Hide thinking frame as soon as the first token arrives
+        if self.thinking_var.get():
+            self.progress_bar.stop()
+            self.progress_bar.configure(mode="determinate")
+            self.thinking_frame.pack_forget()
+
+        # Open an empty Orion bubble for the tokens to stream into
+        self.streaming_text = ""
+        self.streaming_label = self.add_to_history("Orion: \n")
+        self.streaming_index = len(self.chat_history_data) - 1
+
+    def update_streamed_response(self, text):
+        if self.streaming_label is None:
+            return
+        self.streaming_text = text
+        try:
+            self.streaming_label.configure(text=text + "█")
+        except Exception:
+            # This can happen if the window is closed while streaming
+            pass
 
     def toggle_sidebar(self):
         if self.sidebar_collapsed:
@@ -1287,9 +1443,9 @@ Built with Python and CustomTkinter."""
             self.sidebar_collapsed = True
 
     def load_chat(self, chat_id):
-        # Load chat from file
+        # Load chat from the store
         try:
-            chat_data = self._load_chat_data(f"chat_{chat_id}.dat")
+            chat_data = self.chat_store.load(chat_id)
             self.current_chat_id = chat_id
             self.chat_history_data = chat_data['history']
 
@@ -1312,10 +1468,10 @@ Built with Python and CustomTkinter."""
 
                 # Create message bubble with correct index
                 self.create_message_bubble(sender, message, index)
-        except FileNotFoundError:
+        except KeyError:
             self.add_to_history(f"Orion: Chat {chat_id} not found.\n")
 
-    def show_response(self, response):
+    def show_response(self, response, streamed=False):
         # Hide thinking frame and show response
         if self.thinking_var.get():
             self.progress_bar.stop()
@@ -1333,6 +1489,11 @@ Built with Python and CustomTkinter."""
             self.add_to_history("Orion: Chat history cleared.\n")
         elif response == "Exiting...":
             self.root.destroy()
+        elif streamed and self.streaming_label is not None:
+            # Reply was already rendered token by token, just finalize the bubble
+            self.chat_history_data[self.streaming_index] = f"Orion: {response}\n"
+            self.streaming_label.configure(text=response)
+            self.streaming_label = None
         else:
             self.add_to_history(f"Orion: {response}\n", animate=self.thinking_var.get())
 
@@ -1368,7 +1529,7 @@ Built with Python and CustomTkinter."""
     def share_chat(self, chat_id):
         try:
             # Load chat data
-            chat_data = self._load_chat_data(f"chat_{chat_id}.dat")
+            chat_data = self.chat_store.load(chat_id)
             
             # Ask for save location
             filename = filedialog.asksaveasfilename(
@@ -1422,7 +1583,7 @@ Built with Python and CustomTkinter."""
                     self.search_entry.delete(0, "end")
 
                 # Save as local chat
-                self._save_chat_data(f"chat_{new_chat_id}.dat", chat_data)
+                self.chat_store.save(new_chat_id, chat_data)
                 
                 self.refresh_chat_list()
                 self.load_chat(new_chat_id)
@@ -1434,11 +1595,8 @@ Built with Python and CustomTkinter."""
 
     def save_chat(self):
         if self.current_chat_id is not None:
-            # Try to load existing data to preserve metadata (title, pinned status)
-            try:
-                existing_data = self._load_chat_data(f"chat_{self.current_chat_id}.dat")
-            except Exception:
-                existing_data = {}
+            # Preserve metadata (title, pinned status) from the index instead of reloading the chat
+            existing_data = self.chat_store.get(self.current_chat_id) or {}
 
             chat_data = {
                 'history': self.chat_history_data,
@@ -1451,62 +1609,80 @@ Built with Python and CustomTkinter."""
             if chat_data['custom_title'] is None:
                 del chat_data['custom_title']
 
-            self._save_chat_data(f"chat_{self.current_chat_id}.dat", chat_data)
+            self.chat_store.save(self.current_chat_id, chat_data)
 
-    def refresh_chat_list(self):
-        # Get filter text
-        filter_text = self.search_entry.get().lower() if hasattr(self, 'search_entry') else ""
-
-        # Clear existing buttons
-        for widget in self.chat_list.winfo_children():
-            widget.destroy()
-
-        # Find all chat files
-        chat_files = [f for f in os.listdir(self.data_dir) if f.startswith('chat_') and f.endswith('.dat')]
-        
-        # Load chat metadata for sorting
-        chats = []
-        for chat_file in chat_files:
-            chat_id = int(chat_file.split('_')[1].split('.')[0])
-            try:
-                chat_data = self._load_chat_data(chat_file)
-                chats.append({'id': chat_id, 'data': chat_data})
-            except Exception:
-                pass
+    def schedule_chat_search(self):
+        # Search once typing pauses instead of on every key
+        if self.chat_search_after is not None:
+            self.root.after_cancel(self.chat_search_after)
+        self.chat_list_limit = CHAT_LIST_PAGE
+        self.chat_search_after = self.root.after(CHAT_SEARCH_DELAY_MS, self.refresh_chat_list)
 
-        # Sort: Pinned first (True > False), then by timestamp (descending)
-        chats.sort(key=lambda x: (x['data'].get('pinned', False), x['data'].get('timestamp', 0)), reverse=True)
+    def refresh_chat_list(self):
+        # Search in a background thread; the results are shown on the main thread,
+        # unless a newer search has been started in the meantime
+        self.chat_search_after = None
+        filter_text = self.search_entry.get() if hasattr(self, 'search_entry') else ""
+        self.chat_search_generation += 1
+        generation = self.chat_search_generation
 
-        for chat in chats:
-            chat_id = chat['id']
-            chat_data = chat['data']
+        def run_search():
             try:
-                # Get title - use custom title if available, otherwise first user message
-                title = chat_data.get('custom_title', "New Chat")
-                if title == "New Chat":
-                    for msg in chat_data['history']:
-                        if msg.startswith("You: "):
-                            title = msg[5:].strip()[:30] + "..." if len(msg[5:].strip()) > 30 else msg[5:].strip()
-                            break
-                
-                # Filter by title
-                if filter_text and filter_text not in title.lower():
-                    continue
-
-                # Add pin indicator
-                if chat_data.get('pinned', False):
-                    title = "📌 " + title
-
-                chat_button = ctk.CTkButton(self.chat_list, text=title, command=lambda cid=chat_id: self.load_chat(cid))
-                chat_button.pack(fill="x", pady=2)
+                # Chats whose title or messages match the filter: pinned first, then newest first
+                chats = self.chat_store.list(filter_text)
+            except Exception as e:
+                print(f"Chat search failed: {e}")
+                return
+            self.root.after(0, lambda: self.show_chat_list(chats, generation))
 
-                # Bind right-click to show context menu
-                chat_button.bind("<Button-3>", lambda event, cid=chat_id: self.show_chat_context_menu(event, cid))
+        threading.Thread(target=run_search, daemon=True).start()
 
-                # Bind double-click to rename
-                chat_button.bind("<Double-Button-1>", lambda event, cid=chat_id: self.rename_chat(cid))
-            except Exception:
-                pass  # Skip corrupted files
+    def show_chat_list(self, chats, generation):
+        if generation != self.chat_search_generation:
+            return
+        self.chat_list_results = chats
+        visible = chats[:self.chat_list_limit]
+
+        # Reuse the rows already there, touching only those that now show another chat or title;
+        # the shown rows are always the first chat_rows_shown, so packing keeps them in order
+        self.show_more_button.pack_forget()
+        for index, chat in enumerate(visible):
+            if index == len(self.chat_rows):
+                self.chat_rows.append(self.create_chat_row())
+            row = self.chat_rows[index]
+
+            # Add pin indicator
+            title = "📌 " + chat['title'] if chat['pinned'] else chat['title']
+            if row.chat_id != chat['id'] or row.shown_title != title:
+                row.chat_id = chat['id']
+                row.shown_title = title
+                row.configure(text=title)
+            if index >= self.chat_rows_shown:
+                row.pack(fill="x", pady=2)
+        for row in self.chat_rows[len(visible):self.chat_rows_shown]:
+            row.pack_forget()
+        self.chat_rows_shown = len(visible)
+
+        if len(chats) > len(visible):
+            self.show_more_button.configure(text=f"Show more ({len(chats) - len(visible)})")
+            self.show_more_button.pack(fill="x", pady=2)
+
+    def create_chat_row(self):
+        row = ctk.CTkButton(self.chat_list, text="")
+        row.chat_id = None
+        row.shown_title = None
+        row.configure(command=lambda: self.load_chat(row.chat_id))
+
+        # Bind right-click to show context menu
+        row.bind("<Button-3>", lambda event: self.show_chat_context_menu(event, row.chat_id))
+
+        # Bind double-click to rename
+        row.bind("<Double-Button-1>", lambda event: self.rename_chat(row.chat_id))
+        return row
+
+    def show_more_chats(self):
+        self.chat_list_limit += CHAT_LIST_PAGE
+        self.show_chat_list(self.chat_list_results, self.chat_search_generation)
 
     def change_theme(self, theme):
         ctk.set_appearance_mode(theme.lower())
@@ -1527,11 +1703,10 @@ Built with Python and CustomTkinter."""
                 f.write("Orion Chat History Export\n")
                 f.write("=" * 50 + "\n\n")
 
-                chat_files = [f for f in os.listdir(self.data_dir) if f.startswith('chat_') and f.endswith('.dat')]
-                for chat_file in chat_files:
+                for chat in self.chat_store.list():
                     try:
-                        chat_data = self._load_chat_data(chat_file)
-                        f.write(f"Chat ID: {chat_file}\n")
+                        chat_data = self.chat_store.load(chat['id'])
+                        f.write(f"Chat ID: {chat['id']}\n")
                         f.write(f"Model: {chat_data.get('model', 'Unknown')}\n")
                         f.write(f"Timestamp: {time.ctime(chat_data.get('timestamp', 0))}\n")
                         f.write("-" * 30 + "\n")
@@ -1547,17 +1722,11 @@ Built with Python and CustomTkinter."""
 
     def clear_all_chats(self):
         # Confirmation dialog would be better, but for simplicity:
-        chat_files = [f for f in os.listdir(self.data_dir) if f.startswith('chat_') and f.endswith('.dat')]
-        deleted_count = 0
-        for chat_file in chat_files:
-            try:
-                os.remove(os.path.join(self.data_dir, chat_file))
-                deleted_count += 1
-            except Exception:
-                pass
+        deleted_count = self.chat_store.clear()
 
+        self.orion.response_cache.clear()  # Titles were generated from these chats
         self.refresh_chat_list()
-        self.add_to_history(f"Orion: Cleared {deleted_count} chat files.\n")
+        self.add_to_history(f"Orion: Cleared {deleted_count} chats.\n")
 
     def check_model_status(self):
         self.model_status_label.configure(text="Checking...", text_color="orange")
@@ -1759,11 +1928,29 @@ Built with Python and CustomTkinter."""
             'thinking_animation': self.thinking_var.get(),
             'typing_speed': self.typing_speed_var.get(),
             'strict_mode': self.strict_mode_var.get(),
-            'startup_greeting': self.startup_greeting_var.get()
+            'startup_greeting': self.startup_greeting_var.get(),
+            'context_token_budget': self.context_budget_var.get(),
+            'continuous_batching': self.batching_var.get(),
+            'model_memory_gb': self.model_memory_var.get(),
+            'low_memory_loading': self.low_memory_var.get(),
+            'half_precision': self.half_precision_var.get(),
+            'inference_threads': self.inference_threads_var.get(),
+            'interop_threads': self.orion.inter_op_threads,
+            'persist_response_cache': self.persist_cache_var.get(),
+            'trace_logging': self.trace_logging_var.get()
         }
 
         # Apply settings immediately
         self.orion.strict_mode = self.strict_mode_var.get()
+        self.orion.context_token_budget = self.context_budget_var.get()
+        self.orion.batching_enabled = self.batching_var.get()
+        self.orion.low_memory_loading = self.low_memory_var.get()
+        self.orion.half_precision = self.half_precision_var.get()
+        self.orion.model_registry.set_budget(self.model_memory_var.get() * 1024 ** 3)
+        if self.inference_threads_var.get() != self.orion.intra_op_threads:
+            self.orion.configure_threads(self.inference_threads_var.get())
+        self.orion.set_response_cache_persistence(self.persist_cache_var.get())
+        self.orion.set_trace_logging(self.trace_logging_var.get())
 
         try:
             with open(os.path.join(self.data_dir, 'orion_settings.json'), 'w') as f:
@@ -1780,12 +1967,8 @@ Built with Python and CustomTkinter."""
         context_menu = Menu(self.root, tearoff=0)
 
         # Check pinned status
-        is_pinned = False
-        try:
-            chat_data = self._load_chat_data(f"chat_{chat_id}.dat")
-            is_pinned = chat_data.get('pinned', False)
-        except Exception:
-            pass
+        entry = self.chat_store.get(chat_id)
+        is_pinned = entry['pinned'] if entry else False
 
         # Pin/Unpin option
         context_menu.add_command(label="Unpin" if is_pinned else "Pin", command=lambda: self.toggle_pin(chat_id))
@@ -1810,16 +1993,15 @@ Built with Python and CustomTkinter."""
 
     def toggle_pin(self, chat_id):
         try:
-            chat_data = self._load_chat_data(f"chat_{chat_id}.dat")
-            chat_data['pinned'] = not chat_data.get('pinned', False)
-            self._save_chat_data(f"chat_{chat_id}.dat", chat_data)
+            entry = self.chat_store.get(chat_id)
+            self.chat_store.update(chat_id, pinned=not entry['pinned'])
             self.refresh_chat_list()
         except Exception as e:
             self.add_to_history(f"System: Error toggling pin: {str(e)}\n")
 
     def export_single_chat(self, chat_id):
         try:
-            chat_data = self._load_chat_data(f"chat_{chat_id}.dat")
+            chat_data = self.chat_store.load(chat_id)
 
             # Create export file
             export_file = f"chat_export_{chat_id}_{int(time.time())}.txt"
@@ -1846,16 +2028,8 @@ Built with Python and CustomTkinter."""
         rename_window.resizable(False, False)
 
         # Get current title
-        try:
-            chat_data = self._load_chat_data(f"chat_{chat_id}.dat")
-            current_title = chat_data.get('custom_title', "New Chat")
-            if current_title == "New Chat":
-                for msg in chat_data['history']:
-                    if msg.startswith("You: "):
-                        current_title = msg[5:].strip()[:30] + "..." if len(msg[5:].strip()) > 30 else msg[5:].strip()
-                        break
-        except Exception:
-            current_title = "New Chat"
+        entry = self.chat_store.get(chat_id)
+        current_title = entry['title'] if entry else "New Chat"
 
         label = ctk.CTkLabel(rename_window, text="Enter new chat name:")
         label.pack(pady=10)
@@ -1868,9 +2042,7 @@ Built with Python and CustomTkinter."""
             new_title = entry.get().strip()
             if new_title:
                 try:
-                    chat_data = self._load_chat_data(f"chat_{chat_id}.dat")
-                    chat_data['custom_title'] = new_title
-                    self._save_chat_data(f"chat_{chat_id}.dat", chat_data)
+                    self.chat_store.update(chat_id, custom_title=new_title)
                     self.refresh_chat_list()
                     self.add_to_history(f"Orion: Chat renamed to '{new_title}'.\n")
                 except Exception as e:
@@ -1901,7 +2073,7 @@ Built with Python and CustomTkinter."""
 
         def confirm_delete():
             try:
-                os.remove(os.path.join(self.data_dir, f"chat_{chat_id}.dat"))
+                self.chat_store.delete(chat_id)
                 # If this was the current chat, clear it
                 if self.current_chat_id == chat_id:
                     self.current_chat_id = None
@@ -1941,10 +2113,27 @@ Built with Python and CustomTkinter."""
                 self.strict_mode_var.set(bool(settings.get('strict_mode', False)))
                 self.startup_greeting_var.set(settings.get('startup_greeting', "Hello! I am Orion, an AI chatbot created by OmniNode. How can I help you today?"))
                 self.system_prompt = settings.get('system_prompt', "")
+                self.context_budget_var.set(max(512, min(8192, int(settings.get('context_token_budget', 2048)))))
+                self.batching_var.set(bool(settings.get('continuous_batching', True)))
+                self.low_memory_var.set(bool(settings.get('low_memory_loading', True)))
+                self.half_precision_var.set(bool(settings.get('half_precision', False)))
+                self.inference_threads_var.set(max(0, int(settings.get('inference_threads', 0))))
+                self.persist_cache_var.set(bool(settings.get('persist_response_cache', False)))
+                self.trace_logging_var.set(bool(settings.get('trace_logging', False)))
+                if 'model_memory_gb' in settings:
+                    self.model_memory_var.set(max(1, min(64, int(settings['model_memory_gb']))))
                 
                 # Sync with Orion instance
                 self.orion.ollama_model = self.ollama_model_var.get()
                 self.orion.strict_mode = self.strict_mode_var.get()
+                self.orion.context_token_budget = self.context_budget_var.get()
+                self.orion.batching_enabled = self.batching_var.get()
+                self.orion.low_memory_loading = self.low_memory_var.get()
+                self.orion.half_precision = self.half_precision_var.get()
+                self.orion.model_registry.set_budget(self.model_memory_var.get() * 1024 ** 3)
+                self.orion.configure_threads(self.inference_threads_var.get(), max(0, int(settings.get('interop_threads', 0))))
+                self.orion.set_response_cache_persistence(self.persist_cache_var.get())
+                self.orion.set_trace_logging(self.trace_logging_var.get())
             else:
                 raise ValueError("Invalid settings format")
 
@@ -2103,9 +2292,13 @@ Built with Python and CustomTkinter."""
         
         def confirm_delete():
             try:
+                # Windows can't delete open databases; the knowledge base reopens on its next lookup
+                self.chat_store.close()
+                self.orion.knowledge_base.close()
                 shutil.rmtree(self.data_dir)
                 if not os.path.exists(self.data_dir):
                     os.makedirs(self.data_dir)
+                self.chat_store = ChatStore(self.data_dir)
                 
                 # Reset state
                 self.current_chat_id = None
@@ -2116,6 +2309,8 @@ Built with Python and CustomTkinter."""
                 self.load_settings() # Reload defaults since file is gone
                 self.add_to_history("System: .orion folder deleted and reset.\n")
             except Exception as e:
+                if self.chat_store.connection is None:
+                    self.chat_store = ChatStore(self.data_dir)
                 self.add_to_history(f"System: Error deleting folder: {str(e)}\n")
             confirm_window.destroy()
 
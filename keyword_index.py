@@ -0,0 +1,60 @@
+import json
+import re
+
+from entity_extractor import word_alternation
+
+
+def load_response_table(path):
+    # Extra custom responses from a JSON file: {"keyword or phrase": ["reply", ...] or "reply"}.
+    # A missing file is an empty table.
+    try:
+        with open(path, 'r', encoding='utf-8') as f:
+            table = json.load(f)
+    except FileNotFoundError:
+        return {}
+    except (OSError, ValueError) as e:
+        print(f"Could not load response table {path}: {e}")
+        return {}
+    if not isinstance(table, dict):
+        print(f"Could not load response table {path}: expected a JSON object")
+        return {}
+
+    responses = {}
+    for key, replies in table.items():
+        if isinstance(replies, str):
+            replies = [replies]
+        replies = [reply for reply in replies if isinstance(reply, str)] if isinstance(replies, list) else []
+        if key.strip() and replies:
+            responses[key.lower()] = replies
+    return responses
+
+
+class KeywordIndex:
+    # Every key of a response table in one regex, laid out as a trie (see word_alternation) inside
+    # a lookahead, so a single scan of the input finds the longest key starting at each position.
+    # Matching cost depends on the input length, not on how many keys the table has.
+    # Keys only match whole words: "no" is not found in "nothing", nor "hi" in "this".
+    def __init__(self, keys):
+        self.order = {}  # key -> position in the table, for breaking ties
+        for key in keys:
+            key = key.lower()
+            if key and key not in self.order:
+                self.order[key] = len(self.order)
+        if self.order:
+            self.pattern = re.compile(r'(?<!\w)(?=(' + word_alternation(self.order) + r')(?!\w))')
+        else:
+            self.pattern = None
+
+    def find_all(self, text):
+        # Keys contained in text as whole words, in order of appearance (of keys starting at
+        # the same position only the longest)
+        if self.pattern is None:
+            return []
+        return [match.group(1) for match in self.pattern.finditer(text.lower())]
+
+    def best_match(self, text):
+        # The longest key contained in text; of equally long ones, the one listed first
+        keys = self.find_all(text)
+        if not keys:
+            return None
+        return max(keys, key=lambda key: (len(key), -self.order[key]))
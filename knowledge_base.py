@@ -0,0 +1,148 @@
+"""Knowledge base for entity linking.
+
+Entries map a lowercase entity name to {'type', 'info', 'link'}. Besides the built-in entries,
+any number can be kept in a SQLite file (knowledge_base.db in the data dir). Import a JSON
+object ({"name": {"type": ..., "info": ..., "link": ...}}) or JSON Lines file (one object
+with a "name" field per line) with:
+
+    python knowledge_base.py <entries.json|entries.jsonl> [--db <path>]
+"""
+import argparse
+import json
+import os
+import sqlite3
+import threading
+from collections import OrderedDict
+
+QUERY_CHUNK = 500  # Names per SELECT; older SQLite builds allow at most 999 parameters
+
+
+class KnowledgeBase:
+    # Lookups check an LRU of recently used names first, then the database, then the built-in
+    # entries (so the database can override them). The database is only opened on the first
+    # lookup that needs it, so start-up doesn't depend on its size, and misses are cached too.
+    def __init__(self, path=None, builtin=None, cache_size=4096):
+        self.path = path
+        self.builtin = {name.lower(): entry for name, entry in (builtin or {}).items()}
+        self.cache_size = cache_size
+        self.cache = OrderedDict()  # name -> entry, or None for names known not to exist
+        self.connection = None
+        self.lock = threading.Lock()  # Lookups come from the GUI and API worker threads
+
+    def _connect(self, create=False):
+        # Called with the lock held; returns None when there is no database yet
+        if self.connection is None and self.path and (create or os.path.exists(self.path)):
+            if create:
+                os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+            self.connection = sqlite3.connect(self.path, check_same_thread=False)
+            self.connection.execute("CREATE TABLE IF NOT EXISTS entities "
+                                    "(name TEXT PRIMARY KEY, type TEXT, info TEXT, link TEXT) WITHOUT ROWID")
+        return self.connection
+
+    def _remember(self, name, entry):
+        self.cache[name] = entry
+        self.cache.move_to_end(name)
+        while len(self.cache) > self.cache_size:
+            self.cache.popitem(last=False)
+
+    def get_many(self, names):
+        # {name: entry} for the given names that exist, with one query for all cache misses
+        found = {}
+        with self.lock:
+            missing = []
+            for name in dict.fromkeys(name.lower() for name in names):
+                if name in self.cache:
+                    self.cache.move_to_end(name)
+                    if self.cache[name] is not None:
+                        found[name] = self.cache[name]
+                else:
+                    missing.append(name)
+            if not missing:
+                return found
+
+            rows = {}
+            connection = self._connect()
+            if connection is not None:
+                for start in range(0, len(missing), QUERY_CHUNK):
+                    chunk = missing[start:start + QUERY_CHUNK]
+                    query = f"SELECT name, type, info, link FROM entities WHERE name IN ({','.join('?' * len(chunk))})"
+                    for name, kind, info, link in connection.execute(query, chunk):
+                        rows[name] = {'type': kind, 'info': info, 'link': link}
+            for name in missing:
+                entry = rows.get(name, self.builtin.get(name))
+                self._remember(name, entry)
+                if entry is not None:
+                    found[name] = entry
+        return found
+
+    def get(self, name, default=None):
+        return self.get_many([name]).get(name.lower(), default)
+
+    def __contains__(self, name):
+        return self.get(name) is not None
+
+    def __getitem__(self, name):
+        entry = self.get(name)
+        if entry is None:
+            raise KeyError(name)
+        return entry
+
+    def add(self, entries):
+        # Store {name: {'type', 'info', 'link'}} (or (name, entry) pairs) in the database
+        items = entries.items() if isinstance(entries, dict) else entries
+        rows = [(name.lower(), entry.get('type'), entry.get('info'), entry.get('link')) for name, entry in items]
+        with self.lock:
+            connection = self._connect(create=True)
+            if connection is None:
+                raise ValueError("Knowledge base has no database path")
+            with connection:
+                connection.executemany("INSERT OR REPLACE INTO entities VALUES (?, ?, ?, ?)", rows)
+            for row in rows:
+                self.cache.pop(row[0], None)  # Including cached misses
+        return len(rows)
+
+    def import_file(self, path, batch_size=10000):
+        # Load a JSON object or JSON Lines file into the database in batches; returns the entry count
+        with open(path, 'r', encoding='utf-8') as f:
+            if path.endswith('.jsonl'):
+                total = 0
+                batch = []
+                for line in f:
+                    if line.strip():
+                        record = json.loads(line)
+                        batch.append((record.pop('name'), record))
+                    if len(batch) >= batch_size:
+                        total += self.add(batch)
+                        batch = []
+                return total + (self.add(batch) if batch else 0)
+            return self.add(json.load(f))
+
+    def __len__(self):
+        with self.lock:
+            connection = self._connect()
+            if connection is None:
+                return len(self.builtin)
+            count = connection.execute("SELECT COUNT(*) FROM entities").fetchone()[0]
+            names = list(self.builtin)
+            overridden = 0
+            if names:
+                query = f"SELECT COUNT(*) FROM entities WHERE name IN ({','.join('?' * len(names))})"
+                overridden = connection.execute(query, names).fetchone()[0]
+        return count + len(names) - overridden
+
+    def close(self):
+        with self.lock:
+            if self.connection is not None:
+                self.connection.close()
+                self.connection = None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Import entries into Orion's knowledge base")
+    parser.add_argument("file", help="JSON object or JSON Lines file of entries")
+    parser.add_argument("--db", default=os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), '.orion', 'knowledge_base.db'))
+    args = parser.parse_args()
+    kb = KnowledgeBase(args.db)
+    count = kb.import_file(args.file)
+    kb.close()
+    print(f"Imported {count} entries into {args.db}")
@@ -6,40 +6,198 @@ import datetime
 import calendar
 import urllib.parse
 import json
+import threading
+import copy
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor
+from model_registry import ModelRegistry
+from model_config import load_model_config, save_model_config
+from response_cache import ResponseCache
+from tracing import Tracer
+import entity_extractor
+from keyword_index import KeywordIndex, load_response_table
+from intent_index import DEFAULT_INTENTS, IntentIndex, load_intent_vocabulary
+from knowledge_base import KnowledgeBase
 
 # Global flag
 AI_AVAILABLE = True
 
+# End-of-turn markers of common chat templates; whichever exist in a model's vocabulary are stop tokens
+END_OF_TURN_TOKENS = ("<|im_end|>", "<|eot_id|>", "<|end|>", "<end_of_turn>", "<|endoftext|>")
+
+# Weight formats a model can be run with (stored per model, see set_model_quantization)
+QUANTIZATION_MODES = ("none", "int8")
+
 # Check for AI virtual environment and adjust path for faster imports
 if os.path.exists('AI'):
     sys.path.insert(0, 'AI/Lib/site-packages')
 
+def default_thread_counts():
+    # Intra-op: the physical cores this process may run on, keeping one free for the GUI and
+    # background threads when there are plenty. Inter-op: generation runs ops one after another,
+    # so a small pool is enough.
+    try:
+        cores = len(os.sched_getaffinity(0))
+    except AttributeError:
+        cores = os.cpu_count() or 1
+    try:
+        import psutil
+        cores = min(cores, psutil.cpu_count(logical=False) or cores)  # Hyper-threads slow down matmuls
+    except ImportError:
+        pass
+    intra = cores - 1 if cores > 4 else cores
+    return max(1, intra), min(2, cores)
+
+class _CancelGeneration:
+    # Stopping criterion that ends model.generate once the consumer of a stream goes away
+    def __init__(self, event):
+        self.event = event
+
+    def __call__(self, input_ids, scores, **kwargs):
+        return self.event.is_set()
+
+class _FirstTokenTimer:
+    # Stopping criterion that never stops anything; it notes when the first new token is out,
+    # which is where prefill ends and decode starts
+    def __init__(self):
+        self.first_token_time = None
+
+    def __call__(self, input_ids, scores, **kwargs):
+        if self.first_token_time is None:
+            self.first_token_time = time.perf_counter()
+        return False
+
+class _StopOnText:
+    # Stopping criterion that ends generation as soon as the reply contains one of the stop
+    # strings or a stop token. Whitespace-only stop strings (e.g. a newline ending a title) only
+    # count once the reply has some text.
+    def __init__(self, tokenizer, prompt_length, stop_strings=(), stop_token_ids=()):
+        self.tokenizer = tokenizer
+        self.prompt_length = prompt_length
+        self.stop_strings = [s for s in stop_strings if s]
+        self.stop_token_ids = set(stop_token_ids)
+        self.window = max((len(s) for s in self.stop_strings), default=0) + 2  # Tokens, each at least one character
+        self.checked = prompt_length
+        self.tokens_checked = prompt_length  # Tokens already searched for stop tokens
+        self.text_start = None  # First reply token with visible text
+
+    def __call__(self, input_ids, scores, **kwargs):
+        length = input_ids.shape[-1]
+        if length <= self.prompt_length:
+            return False
+        if self.stop_token_ids:
+            # Assisted generation adds several tokens per call, so look at all the new ones
+            new_tokens = input_ids[0, self.tokens_checked:length].tolist()
+            self.tokens_checked = length
+            if self.stop_token_ids.intersection(new_tokens):
+                return True
+        if not self.stop_strings:
+            return False
+
+        if self.text_start is None:
+            for index in range(self.checked, length):
+                if self.tokenizer.decode(input_ids[0, index:index + 1], skip_special_tokens=True).strip():
+                    self.text_start = index
+                    break
+            else:
+                self.checked = length
+                return False
+
+        # Decode only the new tokens plus enough context for a stop string that spans the boundary
+        start = max(self.text_start, self.checked - self.window)
+        text = self.tokenizer.decode(input_ids[0, start:], skip_special_tokens=True)
+        if start == self.text_start:
+            text = text.lstrip()
+        self.checked = length
+        return any(stop in text for stop in self.stop_strings)
+
 class OrionChatbot:
-    def __init__(self, model_version="1.3.4"):
+    def __init__(self, model_version="1.3.4", model_path=None, intra_op_threads=0, inter_op_threads=0,
+                 low_memory_loading=True, half_precision=False, data_dir=None):
         self.model_version = model_version
         self.current_model = "Basic"  # Default model
         self.system_prompt = None  # Custom system prompt
         self.vision_enabled = False  # Vision capability toggle
         self.llm = None
+        self.model_name = None  # Folder or Hugging Face id of the loaded model
+        self.draft_model = None  # Optional small model for speculative decoding
+        self.draft_model_name = None
+        self._failed_drafts = set()  # (model, configured draft) pairs that failed to load this session
+        self.model_quantization = "none"
+        self._conversation_cache = None  # (token ids, KV cache) left by the previous chat turn
+        self._prefix_caches = OrderedDict()  # Shared prompt prefix -> Future of (token ids, KV cache), per loaded model
+        self._prefix_lock = threading.Lock()  # Only guards the dict; prefills run outside it
+        self.response_cache = ResponseCache()  # Greedy one-off generations (code, titles) by model, prompt and params
+        self.response_cache_enabled = True
+        self.last_usage = None  # Token counts of the most recent generation (see _stream_generate_ids)
+        self.tracer = Tracer()  # Per-stage timings of recent requests, see get_traces
+        # Where each kind of generation stops early: text the model produces once it runs past its
+        # turn, and end-of-turn tokens besides the model's EOS
+        self.stop_sequences = {
+            'chat': {'strings': ["User:"], 'tokens': list(END_OF_TURN_TOKENS)},
+            'title': {'strings': ["\n"], 'tokens': list(END_OF_TURN_TOKENS)},
+            'code': {'strings': [], 'tokens': list(END_OF_TURN_TOKENS)},
+        }
+        self.context_token_budget = 2048  # Max prompt tokens for system prompt + history + new message
+        self.max_history_messages = 200  # Stored history; what reaches the model is limited by the token budget
+        self._token_counts = {}  # (role, content) -> token count with the loaded tokenizer
+        self._message_overhead = None  # Tokens the chat template adds around each message
+        self.batching_enabled = True  # Share forward passes between concurrent generations
+        self.max_batch_size = 8
+        self.scheduler = None  # BatchScheduler for the loaded model, created on first use
+        self._scheduler_lock = threading.Lock()
+        self._batching_failed = False  # Set when the loaded model can't be driven by the scheduler
+        self.model_registry = ModelRegistry()  # Recently used models kept in memory for quick switching
+        self.low_memory_loading = low_memory_loading  # Load without a throwaway random init or duplicate weight copies
+        self.half_precision = half_precision  # Keep bfloat16/float16 weights as stored: half the memory, but slow on most CPUs
+        self.data_dir = data_dir or os.path.join(os.environ.get('LOCALAPPDATA', os.path.expanduser('~')), '.orion')
+        self.intra_op_threads = intra_op_threads  # Torch threads per op, 0 = autodetect
+        self.inter_op_threads = inter_op_threads  # Torch threads running independent ops, 0 = autodetect; fixed once inference starts
+        self._thread_counts = None  # (intra, inter) actually in effect
+        # Model calls outside the batch scheduler run on this one thread, so its torch thread count
+        # is the one that matters and generations don't oversubscribe the cores
+        self._inference_worker = ThreadPoolExecutor(max_workers=1, thread_name_prefix="orion-inference")
         if AI_AVAILABLE:
-            self.initialize_ai()
+            self.initialize_ai(model_path)
         self.responses = self.load_responses()
+        self.intent_index = self.load_intents()  # Keywords -> guided conversation intents
         self.conversation_history = []  # Store conversation history for context
-        self.knowledge_base = self.load_knowledge_base()  # Simple knowledge base for entity linking
+        self.knowledge_base = self.load_knowledge_base()  # Knowledge base for entity linking, see knowledge_base.py
         self.age_verified = False
         self.strict_mode = False
 
-    def initialize_ai(self, custom_model_path=None):
+    def initialize_ai(self, custom_model_path=None, quantization=None):
         print("Initializing local AI (Transformers)...")
         try:
             from transformers import pipeline, AutoTokenizer, AutoModelForCausalLM, AutoConfig
             import torch
+
+            if self._thread_counts is None:
+                self.configure_threads()  # Inter-op threads can only be set before the first model call
             
             # Default model
             model_name = "Qwen/Qwen2.5-1.5B-Instruct"
             if custom_model_path:
                  model_name = custom_model_path
 
+            # Switching back to a model that is still resident skips loading entirely
+            if quantization is None:
+                quantization = self.get_model_quantization(model_name)
+            draft_name = load_model_config(model_name, self.data_dir).get('draft_model')
+            if (model_name, draft_name) in self._failed_drafts:
+                draft_name = None  # Failed to load earlier this session, so the model is cached without it
+            cached = self.model_registry.get(model_name)
+            cached_draft = cached[2][0] if cached is not None and cached[2] else None
+            if cached is not None and self._loaded_quantization(cached[0]) == quantization and cached_draft == draft_name:
+                self._reset_model_state()
+                self.llm, self._prefix_caches, draft = cached
+                self.draft_model_name, self.draft_model = draft or (None, None)
+                self.model_quantization = quantization
+                self.model_name = model_name
+                print(f"Switched to cached model {model_name}.")
+                return True
+
             # Detect GGUF
             is_gguf = False
             gguf_file = None
@@ -53,6 +211,8 @@ class OrionChatbot:
                     gguf_file = gguf_files[0]
 
             print(f"Loading model {model_name}...")
+            self._reset_model_state()
+            load_kwargs = self._model_load_kwargs(is_gguf)
             
             if is_gguf:
                 print(f"GGUF detected: Loading {gguf_file} via Transformers...")
@@ -63,17 +223,39 @@ class OrionChatbot:
                     # Attempt to load model and tokenizer directly from GGUF
                     # If config is missing, we pass the folder path but specify the gguf_file
                     tokenizer = AutoTokenizer.from_pretrained(model_name, gguf_file=gguf_file)
-                    model = AutoModelForCausalLM.from_pretrained(model_name, gguf_file=gguf_file)
+                    model = AutoModelForCausalLM.from_pretrained(model_name, gguf_file=gguf_file, **load_kwargs)
                     self.llm = pipeline("text-generation", model=model, tokenizer=tokenizer, device="cpu", max_new_tokens=512)
                 except Exception as e:
                     print(f"Standard GGUF load failed: {e}. Trying alternative...")
                     # Alternative: point directly to the file if it's a directory error
-                    self.llm = pipeline("text-generation", model=model_name, gguf_file=gguf_file, device="cpu", max_new_tokens=512)
+                    self.llm = pipeline("text-generation", model=model_name, gguf_file=gguf_file, device="cpu", max_new_tokens=512, model_kwargs=load_kwargs)
             else:
                 # Standard HF SafeTensors/PyTorch model
                 tokenizer = AutoTokenizer.from_pretrained(model_name)
-                self.llm = pipeline("text-generation", model=model_name, tokenizer=tokenizer, device_map="cpu", max_new_tokens=512)
+                self.llm = pipeline("text-generation", model=model_name, tokenizer=tokenizer, device_map="cpu", max_new_tokens=512, model_kwargs=load_kwargs)
+
+            if quantization != "none":
+                try:
+                    self._quantize_model(quantization)
+                except Exception as e:
+                    print(f"Quantization to {quantization} failed, using full precision: {e}")
+
+            self.model_quantization = self._loaded_quantization(self.llm)
+            if draft_name and not self._load_draft_model(draft_name):
+                # Often temporary (offline, partial download, out of memory), so the pairing is kept
+                # and only this session runs without it; /draft off unpairs for good
+                self._failed_drafts.add((model_name, draft_name))
+                print(f"Continuing without draft model {draft_name} for this session.")
+
+            # Prefill the default system prompt once so every new chat starts from its KV state
+            try:
+                self._get_prefix_cache([{'role': 'system', 'content': self._default_system_prompt()}])
+            except Exception as e:
+                print(f"System prompt prefill skipped: {e}")
             
+            self.model_name = model_name
+            for evicted in self.model_registry.put(model_name, self.llm, self._prefix_caches, self._draft_entry()):
+                print(f"Unloaded {evicted} to stay within the model memory budget.")
             print("AI initialization complete.")
             return True
         except Exception as e:
@@ -91,14 +273,175 @@ class OrionChatbot:
             except:
                 pass
             self.llm = None
+            self.model_name = None
+            return False
+
+    def load_model(self, model_path, quantization=None):
+        return self.initialize_ai(custom_model_path=model_path, quantization=quantization)
+
+    def get_model_quantization(self, model_name):
+        mode = load_model_config(model_name, self.data_dir).get('quantization', "none")
+        return mode if mode in QUANTIZATION_MODES else "none"
+
+    def set_model_quantization(self, model_name, mode):
+        # Stored next to the model; takes effect the next time the model is loaded
+        if mode not in QUANTIZATION_MODES:
+            raise ValueError(f"Unknown quantization mode {mode}")
+        save_model_config(model_name, self.data_dir, quantization=mode)
+        self.model_registry.remove(model_name)  # The resident copy has the old weights
+
+    def _quantize_model(self, mode):
+        # Dynamic quantization: Linear weights are stored as int8 and activations are quantized
+        # on the fly, roughly quartering the weight memory of a float32 model
+        import torch
+        import warnings
+
+        model = self.llm.model
+        if model.dtype != torch.float32:
+            model.float()  # The int8 kernels work on float32 activations
+        with warnings.catch_warnings():
+            warnings.simplefilter("ignore")  # torch.ao eager-mode quantization warns about moving to torchao
+            torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8, inplace=True)
+        print(f"Quantized linear layers to {mode}.")
+
+    def _loaded_quantization(self, llm):
+        # Dynamically quantized Linear layers keep their int8 weights in _packed_params
+        if any(hasattr(module, '_packed_params') for module in llm.model.modules()):
+            return "int8"
+        return "none"
+
+    def configure_threads(self, intra_op_threads=None, inter_op_threads=None):
+        # Apply torch thread counts (None keeps the current setting, 0 autodetects).
+        # Returns the (intra, inter) counts now in effect.
+        import torch
+
+        if intra_op_threads is not None:
+            self.intra_op_threads = intra_op_threads
+        if inter_op_threads is not None:
+            self.inter_op_threads = inter_op_threads
+        auto_intra, auto_inter = default_thread_counts()
+        intra = self.intra_op_threads or auto_intra
+        inter = self.inter_op_threads or auto_inter
+
+        try:
+            torch.set_num_interop_threads(inter)
+        except RuntimeError:
+            # Torch only allows this before inter-op work has started
+            inter = torch.get_num_interop_threads()
+            if self.inter_op_threads and self.inter_op_threads != inter:
+                print(f"Inter-op threads stay at {inter} until Orion restarts.")
+
+        # Each thread keeps the intra-op count it had when it first ran an op, so set it on the
+        # threads that do the work: the inference worker, the caller and the batch scheduler.
+        # Called from the GUI thread, so nothing here waits for a reply in progress: the worker
+        # applies it after its current job and the scheduler before its next forward pass.
+        self._inference_worker.submit(torch.set_num_threads, intra)
+        torch.set_num_threads(intra)
+        with self._scheduler_lock:
+            if self.scheduler is not None:
+                self.scheduler.set_num_threads(intra)
+        self._thread_counts = (intra, inter)
+        return self._thread_counts
+
+    def _model_load_kwargs(self, is_gguf=False):
+        # from_pretrained memory-maps safetensors files; low_cpu_mem_usage skips the throwaway random
+        # init, which mostly matters for GGUF and .bin checkpoints. Only half_precision makes the
+        # loaded model smaller: without it everything, GGUF included, is float32, because bfloat16
+        # matmuls are much slower than float32 on CPUs without AVX512-BF16/AMX (and on Apple CPUs),
+        # see "benchmark.py load".
+        import torch
+        import transformers
+
+        dtype_key = 'dtype' if int(transformers.__version__.split('.')[0]) >= 5 else 'torch_dtype'  # Renamed in 5.0
+        if self.half_precision:
+            # GGUF weights can't stay quantized in Transformers, so dequantize to half the size of float32
+            dtype = torch.bfloat16 if is_gguf else "auto"
+        else:
+            dtype = torch.float32
+        if not self.low_memory_loading:
+            return {dtype_key: dtype}
+        return {'low_cpu_mem_usage': True, dtype_key: dtype}
+
+    def _reset_model_state(self):
+        # Per-model state that must not leak into the next model
+        self._conversation_cache = None
+        self._prefix_caches = OrderedDict()
+        self._token_counts = {}  # Counts depend on the tokenizer
+        self._message_overhead = None
+        self._stop_scheduler()
+        self._batching_failed = False
+        self.draft_model = None
+        self.draft_model_name = None
+        self.model_quantization = "none"
+
+    def set_response_cache_persistence(self, enabled):
+        # Keep cached responses in the data dir across restarts, or memory only
+        self.response_cache.set_path(os.path.join(self.data_dir, 'response_cache.json') if enabled else None)
+
+    def set_trace_logging(self, enabled):
+        # Append every request trace to traces.jsonl in the data dir, or keep them in memory only
+        self.tracer.path = os.path.join(self.data_dir, 'traces.jsonl') if enabled else None
+
+    def get_traces(self, limit=None):
+        # Most recent request traces, oldest first. Each one is a dict with the request name,
+        # total_ms, spans ({'name', 'start_ms', 'duration_ms'}), token usage and decode tokens_per_second.
+        return self.tracer.recent(limit)
+
+    def get_last_trace(self):
+        traces = self.tracer.recent(1)
+        return traces[0] if traces else None
+
+    def format_trace(self, trace):
+        # Human-readable latency breakdown of one trace
+        lines = [f"{trace['name']}: {trace['total_ms']:.1f} ms total"]
+        for span in trace['spans']:
+            lines.append(f"  {span['name']:<18} {span['duration_ms']:9.1f} ms")
+        usage = trace['usage']
+        if usage:
+            lines.append(f"  tokens: {usage.get('prompt_tokens', 0)} prompt ({usage.get('cached_prompt_tokens', 0)} cached), "
+                         f"{usage.get('completion_tokens', 0)} completion")
+        if trace['tokens_per_second']:
+            lines.append(f"  decode speed: {trace['tokens_per_second']:.1f} tokens/s")
+        return "\n".join(lines)
+
+    def _load_draft_model(self, draft_name):
+        # A small model from the same family that proposes several tokens at a time for the main
+        # model to verify in one forward pass (assisted generation)
+        self.draft_model, self.draft_model_name = None, None
+        try:
+            from transformers import AutoModelForCausalLM
+
+            draft = AutoModelForCausalLM.from_pretrained(draft_name, **self._model_load_kwargs())
+            if draft.config.vocab_size != self.llm.model.config.vocab_size:
+                print(f"Draft model {draft_name} uses a different vocabulary, speculative decoding disabled.")
+                return False
+            self.draft_model, self.draft_model_name = draft, draft_name
+            print(f"Speculative decoding with draft model {draft_name}.")
+            return True
+        except Exception as e:
+            print(f"Could not load draft model {draft_name}: {e}")
             return False
 
-    def load_model(self, model_path):
-        return self.initialize_ai(custom_model_path=model_path)
+    def _draft_entry(self):
+        return (self.draft_model_name, self.draft_model) if self.draft_model is not None else None
+
+    def set_draft_model(self, draft_name):
+        # Pair the loaded model with a draft model (None to unpair). Stored next to the model.
+        if not self.llm or not self.model_name:
+            return False
+        if draft_name and not self._load_draft_model(draft_name):
+            return False
+        self._failed_drafts.discard((self.model_name, draft_name))
+        if not draft_name:
+            self.draft_model, self.draft_model_name = None, None
+        save_model_config(self.model_name, self.data_dir, draft_model=draft_name or None)
+        self.model_registry.put(self.model_name, self.llm, self._prefix_caches, self._draft_entry())
+        return True
 
     def load_knowledge_base(self):
-        # Simple knowledge base for entity linking
-        return {
+        # Built-in entries for entity linking, extended by knowledge_base.db in the data dir, which is
+        # opened on first use and can hold any number of entries
+        builtin = {
             "paris": {"type": "location", "info": "Paris is the capital and most populous city of France.", "link": "https://en.wikipedia.org/wiki/Paris"},
             "london": {"type": "location", "info": "London is the capital and largest city of England and the United Kingdom.", "link": "https://en.wikipedia.org/wiki/London"},
             "tokyo": {"type": "location", "info": "Tokyo is the capital and most populous city of Japan.", "link": "https://en.wikipedia.org/wiki/Tokyo"},
@@ -108,10 +451,13 @@ class OrionChatbot:
             "javascript": {"type": "technology", "info": "JavaScript is a programming language for web development.", "link": "https://developer.mozilla.org/en-US/docs/Web/JavaScript"},
             "ai": {"type": "technology", "info": "Artificial Intelligence is the simulation of human intelligence in machines.", "link": "https://en.wikipedia.org/wiki/Artificial_intelligence"}
         }
+        return KnowledgeBase(os.path.join(self.data_dir, 'knowledge_base.db'), builtin)
 
-    def load_responses(self):
-        # Custom AI responses dictionary
-        return {
+    def load_responses(self, path=None):
+        # Custom AI responses dictionary: the built-in table below, extended (and overridden) by a
+        # larger one from responses.json in the data dir or the given path. Also builds the keyword
+        # index get_custom_response searches.
+        responses = {
             "hi": ["Hello! How can I help you today?", "Hi there! What's up?", "Hey! Nice to see you!"],
             "hello": ["Hi there! Nice to meet you!", "Hello! How can I assist you?", "Greetings! How are you?"],
             "how are you": ["I'm doing great, thank you for asking! How about you?", "I'm fantastic! How are you feeling today?", "I'm well, thanks! What's on your mind?"],
@@ -181,65 +527,478 @@ class OrionChatbot:
             "really": ["Yes, really!", "Indeed!", "Absolutely!"],
             "wow": ["Impressive, right?", "Wow!", "Amazing!"],
         }
+        responses.update(load_response_table(path or os.path.join(self.data_dir, 'responses.json')))
+        self.response_index = KeywordIndex(responses)
+        return responses
 
-    def get_ai_response(self, user_input, model="Basic", image_data=None):
-        # Use local embedded AI for conversational responses
-        if not self.llm:
-            return self.get_custom_response(user_input.lower())
+    def _default_system_prompt(self):
+        return f"You are Orion, a helpful, friendly, and concise AI assistant created by OmniNode. You are chatting with a user. Respond directly to the user's input. Do not address yourself or write formal letters. Be natural and conversational. Your version is {self.model_version}."
+
+    def _build_chat_messages(self, user_input):
+        if self.system_prompt:
+            system_prompt = self.system_prompt
+        else:
+            system_prompt = self._default_system_prompt()
+
+        # Build messages with conversation history
+        system_msg = {'role': 'system', 'content': system_prompt}
+        user_msg = {'role': 'user', 'content': user_input}
+
+        # Pack as much recent history as fits the token budget, newest first
+        budget = self.context_token_budget
+        max_positions = getattr(self.llm.model.config, 'max_position_embeddings', None)
+        if max_positions:
+            budget = min(budget, max_positions - 512)  # Leave room for the reply
+        budget -= self._count_message_tokens(system_msg) + self._count_message_tokens(user_msg)
+
+        recent_history = []
+        for hist in reversed(self.conversation_history):
+            cost = self._count_message_tokens(hist)
+            if cost > budget:
+                break
+            budget -= cost
+            recent_history.append(hist)
+        recent_history.reverse()
+
+        # Templates that require alternating roles expect the history to open with a user turn
+        while recent_history and recent_history[0]['role'] != 'user':
+            recent_history.pop(0)
+
+        return [system_msg] + recent_history + [user_msg]
+
+    def _count_message_tokens(self, message):
+        # Token cost of one chat message, cached so history isn't re-tokenized every turn
+        key = (message['role'], message['content'])
+        count = self._token_counts.get(key)
+        if count is None:
+            tokenizer = self.llm.tokenizer
+            if self._message_overhead is None:
+                # Measure what the template wraps around a message: render with and without one extra turn
+                try:
+                    base = [{'role': 'user', 'content': 'x'}]
+                    one = tokenizer(tokenizer.apply_chat_template(base, tokenize=False), add_special_tokens=False)["input_ids"]
+                    two = tokenizer(tokenizer.apply_chat_template(base + [{'role': 'assistant', 'content': 'y'}], tokenize=False), add_special_tokens=False)["input_ids"]
+                    self._message_overhead = max(len(two) - len(one) - len(tokenizer.encode('y', add_special_tokens=False)), 0)
+                except Exception:
+                    self._message_overhead = 8
+            count = len(tokenizer.encode(message['content'], add_special_tokens=False)) + self._message_overhead
+            if len(self._token_counts) > 4096:
+                self._token_counts.clear()
+            self._token_counts[key] = count
+        return count
+
+    def _take_conversation_cache(self, input_ids):
+        # Hand out the KV cache of the previous turn, cropped to the token prefix it shares with
+        # this prompt (system prompt + unchanged history), so only the new messages get prefilled
+        cached = self._conversation_cache
+        self._conversation_cache = None
+        if cached is None:
+            return None
 
+        cached_ids, cache = cached
+        limit = min(len(cached_ids), len(input_ids) - 1, cache.get_seq_length())
+        common = 0
+        while common < limit and cached_ids[common] == input_ids[common]:
+            common += 1
+        if common == 0:
+            return None
+
+        if not self._crop_cache(cache, common):
+            return None  # Cache type can't be cropped (e.g. sliding window), prefill from scratch
+        return cache
+
+    def _crop_cache(self, cache, length):
+        # Drop KV entries past the first `length` tokens (negative crop works on old and new transformers)
+        excess = cache.get_seq_length() - length
+        if excess <= 0:
+            return True
         try:
-            if self.system_prompt:
-                system_prompt = self.system_prompt
+            cache.crop(-excess)
+            return True
+        except Exception:
+            return False
+
+    def _get_prefix_cache(self, prefix_messages):
+        # KV state for the part of the prompt that only depends on prefix_messages (usually the
+        # system prompt). Computed once per loaded model and shared by every request that starts with it.
+        # The first request for a prefix computes it; requests for the same prefix meanwhile wait
+        # for its result, and requests for other prefixes aren't held up at all.
+        key = tuple((m['role'], m['content']) for m in prefix_messages)
+        caches = self._prefix_caches
+        with self._prefix_lock:
+            pending = caches.get(key)
+            if pending is not None:
+                caches.move_to_end(key)
+                owner = False
             else:
-                system_prompt = f"You are Orion, a helpful, friendly, and concise AI assistant created by OmniNode. You are chatting with a user. Respond directly to the user's input. Do not address yourself or write formal letters. Be natural and conversational. Your version is {self.model_version}."
+                pending = caches[key] = Future()
+                owner = True
+                # Custom system prompts and per-language code prompts add entries, keep only the
+                # most recently used few
+                while len(caches) > 8:
+                    caches.popitem(last=False)
+        if not owner:
+            return pending.result()
 
-            # Build messages with conversation history
-            messages = [{'role': 'system', 'content': system_prompt}]
+        try:
+            import torch
 
-            # Context summarization for better performance
-            # Use a slightly smaller history window for stability
-            recent_history = self.conversation_history[-8:] if len(self.conversation_history) > 8 else self.conversation_history
-            
-            for hist in recent_history:
-                messages.append(hist)
+            # The shared prefix is whatever the chat template renders identically for any user message
+            tokenizer = self.llm.tokenizer
+            renders = []
+            for probe in ("A", "B"):
+                text = tokenizer.apply_chat_template(prefix_messages + [{'role': 'user', 'content': probe}], tokenize=False, add_generation_prompt=True)
+                renders.append(tokenizer(text, add_special_tokens=False)["input_ids"])
+            prefix_ids = []
+            for a, b in zip(*renders):
+                if a != b:
+                    break
+                prefix_ids.append(a)
+
+            def prefill():
+                with torch.no_grad():
+                    return self.llm.model(input_ids=torch.tensor([prefix_ids]), use_cache=True)
+
+            entry = None
+            if prefix_ids:
+                output = self._inference_worker.submit(prefill).result()
+                entry = (prefix_ids, output.past_key_values)
+        except Exception as e:
+            # Let the next request try again
+            with self._prefix_lock:
+                if caches.get(key) is pending:
+                    del caches[key]
+            pending.set_exception(e)
+            raise
+        pending.set_result(entry)
+        return entry
+
+    def _clone_prefix_cache(self, prefix_messages, input_ids, min_length=0):
+        # Private copy of the shared prefix cache for one request, or None if it covers no more
+        # than min_length tokens of the prompt
+        entry = self._get_prefix_cache(prefix_messages)
+        if entry is None:
+            return None
 
-            # Add current user input
-            user_msg = {'role': 'user', 'content': user_input}
-            messages.append(user_msg)
+        prefix_ids, cache = entry
+        limit = min(len(prefix_ids), len(input_ids) - 1)
+        common = 0
+        while common < limit and prefix_ids[common] == input_ids[common]:
+            common += 1
+        if common <= min_length:
+            return None
+
+        cache = copy.deepcopy(cache)
+        if not self._crop_cache(cache, common):
+            return None
+        return cache
+
+    def _get_scheduler(self):
+        # Continuous-batching scheduler for the loaded model, started on first use
+        if not self.batching_enabled or self._batching_failed or not self.llm:
+            return None
+        with self._scheduler_lock:
+            if self.scheduler is None:
+                from scheduler import BatchScheduler
+
+                eos = self.llm.model.generation_config.eos_token_id
+                eos_ids = set(eos if isinstance(eos, list) else [eos] if eos is not None else [])
+                if self.llm.tokenizer.eos_token_id is not None:
+                    eos_ids.add(self.llm.tokenizer.eos_token_id)
+                num_threads = self._thread_counts[0] if self._thread_counts else None
+                self.scheduler = BatchScheduler(self.llm.model, eos_ids, max_batch_size=self.max_batch_size,
+                                                num_threads=num_threads)
+            return self.scheduler
+
+    def _stop_scheduler(self):
+        with self._scheduler_lock:
+            if self.scheduler is not None:
+                self.scheduler.stop()
+                self.scheduler = None
+
+    def _run_generation(self, input_ids, streamer, stopping_criteria, generate_kwargs):
+        # Generate through the batch scheduler when possible, plain model.generate otherwise.
+        # Returns (prompt + reply token ids, KV cache).
+        # Speculative decoding checks one sequence at a time, so it takes the place of batching.
+        # The scheduler only takes requests whose settings (merged with the model's
+        # generation_config, like model.generate does) it can reproduce.
+        from scheduler import GenerationRequest, SchedulerStopped, effective_sampling
+
+        llm = self.llm
+        sampling = None
+        if self.draft_model is None:
+            sampling = effective_sampling(llm.model.generation_config, generate_kwargs)
+        else:
+            generate_kwargs['assistant_model'] = self.draft_model
+        for _ in range(3):
+            scheduler = self._get_scheduler() if sampling is not None and self.llm is llm else None
+            if scheduler is None:
+                break
+            request = GenerationRequest(input_ids, streamer=streamer, stopping_criteria=stopping_criteria,
+                                        past_key_values=generate_kwargs.get('past_key_values'),
+                                        max_new_tokens=generate_kwargs.get('max_new_tokens', 512), sampling=sampling)
+            try:
+                scheduler.submit(request).wait()
+                return request.sequence_ids, request.past_key_values
+            except SchedulerStopped:
+                if request.output_ids:
+                    raise  # Part of the reply is already out, can't start over
+                continue  # Stopped while queued (e.g. new thread counts): queue again on a fresh scheduler
+            except Exception as e:
+                if request.output_ids:
+                    raise
+                print(f"Continuous batching unavailable for this model ({e}), using model.generate")
+                self._batching_failed = True
+                self._stop_scheduler()
+                generate_kwargs.pop('past_key_values', None)  # May have been partially filled
+                break
+
+        import torch
+
+        tokenizer = llm.tokenizer
+        output = self._inference_worker.submit(
+            llm.model.generate,
+            input_ids=torch.tensor([input_ids]),
+            attention_mask=torch.ones((1, len(input_ids)), dtype=torch.long),
+            streamer=streamer,
+            stopping_criteria=stopping_criteria,
+            pad_token_id=tokenizer.pad_token_id if tokenizer.pad_token_id is not None else tokenizer.eos_token_id,
+            return_dict_in_generate=True,
+            **generate_kwargs
+        ).result()
+        return output.sequences[0].tolist(), output.past_key_values
+
+    def _stop_criterion(self, stop, prompt_length):
+        # stop is a call site from self.stop_sequences ('chat', 'title', 'code') or a
+        # {'strings': [...], 'tokens': [...]} dict
+        config = self.stop_sequences.get(stop) if isinstance(stop, str) else stop
+        if not config:
+            return None
+        tokenizer = self.llm.tokenizer
+        token_ids = []
+        for token in config.get('tokens', []):
+            token_id = tokenizer.convert_tokens_to_ids(token)
+            if token_id is not None and token_id != tokenizer.unk_token_id:
+                token_ids.append(token_id)
+        return _StopOnText(tokenizer, prompt_length, config.get('strings', []), token_ids)
+
+    def _stream_generate(self, prompt, trace=None, **kwargs):
+        # Text front end of _stream_generate_ids, for prompts rendered with the chat template
+        start = time.perf_counter()
+        input_ids = self.llm.tokenizer(prompt, add_special_tokens=False)["input_ids"]
+        if trace is not None:
+            trace.add_span('tokenization', start, time.perf_counter())
+        return self._stream_generate_ids(input_ids, trace=trace, **kwargs)
+
+    def _stream_generate_ids(self, input_ids, reuse_conversation_cache=False, prefix_messages=None, stop=None, usage=None, trace=None, **generate_kwargs):
+        # Generate from prompt token ids on a worker thread and yield decoded text as soon as each
+        # new token is ready; the prompt itself is never decoded.
+        # stop names the call site whose stop strings/tokens end generation early (see stop_sequences).
+        # usage, if given, is a dict that gets this call's token counts once generation is over:
+        # prompt_tokens, completion_tokens, total_tokens, cached_prompt_tokens (prompt tokens whose
+        # KV state was reused instead of prefilled) and cached_response. The same dict is kept in self.last_usage.
+        # trace (a RequestTrace) gets prefill and decode spans and the token counts.
+        from transformers import TextIteratorStreamer, StoppingCriteriaList
+
+        input_ids = list(input_ids)
+        usage = usage if usage is not None else {}
+        self.last_usage = usage
+
+        # Greedy one-off generations are deterministic, so a repeat is answered from the response cache
+        cache_key = None
+        if self.response_cache_enabled and not generate_kwargs.get('do_sample') and not reuse_conversation_cache:
+            model_id = f"{self.model_name}|{self.model_quantization}"
+            stop_config = self.stop_sequences.get(stop) if isinstance(stop, str) else stop
+            cache_key = ResponseCache.make_key(model_id, input_ids, dict(generate_kwargs, stop=stop_config))
+            cached = self.response_cache.get(cache_key)
+            if isinstance(cached, dict):
+                usage.update(prompt_tokens=len(input_ids), completion_tokens=cached['completion_tokens'],
+                             total_tokens=len(input_ids) + cached['completion_tokens'],
+                             cached_prompt_tokens=len(input_ids), cached_response=True)
+                if trace is not None:
+                    trace.usage.update(usage)
+                yield cached['text']
+                return
+        pieces = []
+
+        tokenizer = self.llm.tokenizer
+        streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True)
+        cancel_event = threading.Event()
+        errors = []
+
+        past_key_values = None
+        if reuse_conversation_cache:
+            past_key_values = self._take_conversation_cache(input_ids)
+        if prefix_messages is not None:
+            # A new conversation (or a one-off call) starts from a copy of the shared prefix
+            covered = past_key_values.get_seq_length() if past_key_values is not None else 0
+            shared = self._clone_prefix_cache(prefix_messages, input_ids, min_length=covered)
+            if shared is not None:
+                past_key_values = shared
+        if past_key_values is not None:
+            generate_kwargs['past_key_values'] = past_key_values
+        cached_prompt_tokens = past_key_values.get_seq_length() if past_key_values is not None else 0
+
+        def run():
+            try:
+                timer = _FirstTokenTimer()
+                stopping_criteria = StoppingCriteriaList([_CancelGeneration(cancel_event), timer])
+                stop_criterion = self._stop_criterion(stop, len(input_ids))
+                if stop_criterion is not None:
+                    stopping_criteria.append(stop_criterion)
+                start = time.perf_counter()
+                sequence_ids, cache = self._run_generation(input_ids, streamer, stopping_criteria, generate_kwargs)
+                end = time.perf_counter()
+                if trace is not None:
+                    # Prefill includes any wait for a place in the batch
+                    first_token_time = timer.first_token_time or end
+                    trace.add_span('prefill', start, first_token_time)
+                    trace.add_span('decode', first_token_time, end)
+                completion_tokens = len(sequence_ids) - len(input_ids)
+                usage.update(prompt_tokens=len(input_ids), completion_tokens=completion_tokens,
+                             total_tokens=len(sequence_ids), cached_prompt_tokens=cached_prompt_tokens,
+                             cached_response=False)
+                if reuse_conversation_cache and cache is not None:
+                    # Keep prompt + reply KV state so the next turn only prefills what is new
+                    self._conversation_cache = (sequence_ids, cache)
+            except Exception as e:
+                errors.append(e)
+                streamer.end()  # Unblock the consumer
+
+        thread = threading.Thread(target=run, daemon=True)
+        thread.start()
+        try:
+            for text in streamer:
+                pieces.append(text)
+                yield text
+        finally:
+            # Stops generation early if the consumer closed the stream (e.g. the user cancelled)
+            cancel_event.set()
+        thread.join()
+        if errors:
+            raise errors[0]
+        if trace is not None:
+            trace.usage.update(usage)
+        if cache_key is not None:
+            # Only complete generations get here
+            self.response_cache.put(cache_key, {'text': "".join(pieces), 'completion_tokens': usage['completion_tokens']})
+
+    def _filter_ai_stream(self, pieces, stop_strings=None):
+        # Streaming version of the clean-up get_ai_response used to do after generation:
+        # drop a leading "Orion:" and cut the reply at the first stop string (by default the chat
+        # ones, i.e. where the model starts simulating the user). Generation itself stops there
+        # too, but the stop text has been produced by then. Text that might still turn into one
+        # of those markers is held back until it can't.
+        if stop_strings is None:
+            stop_strings = self.stop_sequences['chat']['strings']
+        stop_strings = [s for s in stop_strings if s]
+        buffer = ""
+        emitted = 0
+        cleaned = ""
+        for piece in pieces:
+            buffer += piece
+            visible = buffer.lstrip()
+            if "Orion:".startswith(visible):
+                continue  # Could still be the "Orion:" prefix
+            cleaned = visible[6:].lstrip() if visible.startswith("Orion:") else visible
+
+            hits = [cleaned.find(stop) for stop in stop_strings if stop in cleaned]
+            if hits:
+                final = cleaned[:min(hits)].rstrip()
+                if len(final) > emitted:
+                    yield final[emitted:]
+                return
+
+            held = 0
+            for stop in stop_strings:
+                for k in range(min(len(stop) - 1, len(cleaned)), held, -1):
+                    if stop.startswith(cleaned[-k:]):
+                        held = k
+                        break
+            safe = len(cleaned[:len(cleaned) - held].rstrip())
+            if safe > emitted:
+                yield cleaned[emitted:safe]
+                emitted = safe
+
+        # Flush whatever was held back once generation has finished
+        if not cleaned and "Orion:" != buffer.strip():
+            cleaned = buffer.strip()
+        final = cleaned.rstrip()
+        if len(final) > emitted:
+            yield final[emitted:]
+
+    def stream_ai_response(self, user_input, model="Basic", image_data=None, trace=None):
+        # Streaming variant of get_ai_response: yields the reply piece by piece while it is generated.
+        # trace, if given, gets the templating, tokenization, prefill and decode spans.
+        if not self.llm:
+            yield self.get_custom_response(user_input.lower())
+            return
+
+        pieces = []
+        try:
+            start = time.perf_counter()
+            messages = self._build_chat_messages(user_input)
 
             # Smart prompting using the model's chat template
             prompt = self.llm.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-            
-            # Generate response
+            if trace is not None:
+                trace.add_span('templating', start, time.perf_counter())
+
             # Qwen likes lower temperature for directness, and stop sequences to prevent rambling
-            response = self.llm(prompt, max_new_tokens=512, do_sample=True, temperature=0.6, top_k=50, top_p=0.9)
-            
-            # Extract only the new generated text
-            full_text = response[0]['generated_text']
-            # Robust split - find where the prompt ends
-            # Most chat templates use a specific end-of-turn token or start-of-response token
-            # We already have 'prompt', so we slice from its length
-            ai_response = full_text[len(prompt):].strip()
-
-            # Clean up common model artifacts (like repeating "User:" or "Orion:")
-            if ai_response.startswith("Orion:"):
-                ai_response = ai_response[6:].strip()
-            if "User:" in ai_response: # Stop model from simulating user
-                ai_response = ai_response.split("User:")[0].strip()
-
-            # Store conversation for context
-            self.conversation_history.append({'role': 'user', 'content': user_input})
-            self.conversation_history.append({'role': 'assistant', 'content': ai_response})
-
-            # Keep only last 30 messages to prevent memory bloat
-            if len(self.conversation_history) > 30:
-                self.conversation_history = self.conversation_history[-30:]
-
-            return ai_response
+            stream = self._stream_generate(prompt, trace=trace, reuse_conversation_cache=True, prefix_messages=messages[:1], stop='chat', max_new_tokens=512, do_sample=True, temperature=0.6, top_k=50, top_p=0.9)
+            for piece in self._filter_ai_stream(stream):
+                pieces.append(piece)
+                yield piece
         except Exception as e:
             print(f"Error in AI response: {e}")
-            # Fallback to custom responses if AI fails
-            return self.get_custom_response(user_input.lower())
+            # Fallback to custom responses if AI fails before producing anything
+            if not pieces:
+                yield self.get_custom_response(user_input.lower())
+            return
+
+        ai_response = "".join(pieces).strip()
+
+        # Store conversation for context
+        self.conversation_history.append({'role': 'user', 'content': user_input})
+        self.conversation_history.append({'role': 'assistant', 'content': ai_response})
+
+        # Cap stored history to prevent memory bloat
+        if len(self.conversation_history) > self.max_history_messages:
+            self.conversation_history = self.conversation_history[-self.max_history_messages:]
+
+    def stream_chat_completion(self, messages, max_new_tokens=512, temperature=0.6, top_p=0.9, stop=None, usage=None):
+        # Stateless generation for API clients: the caller sends the whole conversation and
+        # nothing is added to this chatbot's own history. stop adds the client's own stop strings;
+        # usage is filled with the token counts as in _stream_generate_ids.
+        messages = [{'role': m.get('role', 'user'), 'content': m.get('content') or ""} for m in messages]
+        if not messages or messages[0]['role'] != 'system':
+            messages.insert(0, {'role': 'system', 'content': self.system_prompt or self._default_system_prompt()})
+        last_user = next((m['content'] for m in reversed(messages) if m['role'] == 'user'), "")
+
+        if not self.llm:
+            yield self.get_custom_response(last_user.lower())
+            return
+
+        if temperature and temperature > 0:
+            sampling = {'do_sample': True, 'temperature': temperature, 'top_k': 50, 'top_p': top_p}
+        else:
+            sampling = {'do_sample': False}
+
+        chat_stop = self.stop_sequences['chat']
+        stop_config = {'strings': chat_stop['strings'] + [s for s in (stop or []) if s], 'tokens': chat_stop['tokens']}
+
+        trace = self.tracer.start('api')
+        try:
+            with trace.span('templating'):
+                prompt = self.llm.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
+            stream = self._stream_generate(prompt, trace=trace, prefix_messages=messages[:1], stop=stop_config, usage=usage, max_new_tokens=max_new_tokens, **sampling)
+            yield from self._filter_ai_stream(stream, stop_config['strings'])
+        finally:
+            self.tracer.finish(trace)
+
+    def get_ai_response(self, user_input, model="Basic", image_data=None):
+        # Use local embedded AI for conversational responses
+        return "".join(self.stream_ai_response(user_input, model, image_data))
 
     def summarize_conversation_history(self):
         # Summarize older conversation history for better context retention
@@ -276,129 +1035,81 @@ class OrionChatbot:
             return None
 
     def extract_entities(self, text):
-        # Simple entity recognition using regex patterns
-        import re
-
-        entities = []
-
-        # Date patterns (MM/DD/YYYY, DD/MM/YYYY, etc.)
-        date_patterns = [
-            r'\b\d{1,2}/\d{1,2}/\d{4}\b',  # MM/DD/YYYY or DD/MM/YYYY
-            r'\b\d{4}-\d{1,2}-\d{1,2}\b',  # YYYY-MM-DD
-            r'\b(?:January|February|March|April|May|June|July|August|September|October|November|December)\s+\d{1,2},?\s+\d{4}\b'
-        ]
-
-        # Time patterns
-        time_patterns = [
-            r'\b\d{1,2}:\d{2}(?::\d{2})?\s*(?:AM|PM|am|pm)?\b',
-            r'\b\d{1,2}\s*(?:AM|PM|am|pm)\b'
-        ]
-
-        # Location patterns (cities, countries)
-        location_patterns = [
-            r'\b(?:Paris|London|Tokyo|New York|Berlin|Madrid|Rome|Amsterdam|Vienna|Prague|Budapest|Warsaw|Cairo|Dubai|Singapore|Seoul|Mumbai|Delhi|Bangalore|Chennai|Hyderabad|Pune|Ahmedabad|Jaipur|Surat|Kanpur|Nagpur|Lucknow|Ghaziabad|Indore|Coimbatore|Kochi|Kozhikode|Thrissur|Malappuram|Palakkad|Kollam|Thiruvananthapuram|Kannur|Alappuzha|Kottayam|Pathanamthitta|Idukki|Ernakulam|Wayanad)\b'
-        ]
-
-        # Person names (simple patterns)
-        person_patterns = [
-            r'\b[A-Z][a-z]+\s+[A-Z][a-z]+\b'  # First Last name pattern
-        ]
-
-        # Technology patterns
-        tech_patterns = [
-            r'\b(?:Python|JavaScript|Java|C\+\+|C#|Ruby|PHP|Swift|Kotlin|Go|Rust|TypeScript|React|Angular|Vue|Node\.js|Django|Flask|Spring|Laravel|Express|TensorFlow|PyTorch|Scikit-learn|Pandas|NumPy|Matplotlib|Seaborn|Plotly|Jupyter|Colab|Git|GitHub|Docker|Kubernetes|AWS|Azure|GCP|MongoDB|PostgreSQL|MySQL|Redis|Elasticsearch|Kafka|RabbitMQ|Nginx|Apache|Linux|Ubuntu|CentOS|macOS|Windows|iOS|Android)\b'
-        ]
-
-        # Extract dates
-        for pattern in date_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                entities.append({'type': 'date', 'value': match, 'text': text})
-
-        # Extract times
-        for pattern in time_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                entities.append({'type': 'time', 'value': match, 'text': text})
-
-        # Extract locations
-        for pattern in location_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                entities.append({'type': 'location', 'value': match, 'text': text})
-
-        # Extract persons
-        for pattern in person_patterns:
-            matches = re.findall(pattern, text)
-            for match in matches:
-                entities.append({'type': 'person', 'value': match, 'text': text})
-
-        # Extract technologies
-        for pattern in tech_patterns:
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            for match in matches:
-                entities.append({'type': 'technology', 'value': match, 'text': text})
-
-        return entities
+        # Simple entity recognition using precompiled regex patterns (see entity_extractor)
+        return entity_extractor.extract_entities(text)
 
     def get_response(self, user_input, model="Basic", image_data=None):
-        # Enhanced response generation with entity recognition and guided conversations
+        return "".join(self.stream_response(user_input, model, image_data))
+
+    def stream_response(self, user_input, model="Basic", image_data=None):
+        # Enhanced response generation with entity recognition and guided conversations.
+        # Yields the response in pieces so callers can render AI replies while they are generated.
         if user_input.startswith('/'):
-            return self.handle_command(user_input, model)
-        else:
-            # Check for sensitive content requiring age verification
-            if self.check_age_verification(user_input) and not self.age_verified:
-                return "Restricted content detected. Please verify your age using /verify_age <mm/dd/yyyy> <confirm> <no>."
+            yield self.handle_command(user_input, model)
+            return
+
+        # Check for sensitive content requiring age verification
+        if self.check_age_verification(user_input) and not self.age_verified:
+            yield "Restricted content detected. Please verify your age using /verify_age <mm/dd/yyyy> <confirm> <no>."
+            return
 
+        # Every stage of the reply is timed; see get_traces and /trace
+        trace = self.tracer.start('chat')
+        try:
             # Extract entities from user input
-            entities = self.extract_entities(user_input)
+            with trace.span('entity_extraction'):
+                entities = self.extract_entities(user_input)
 
             # Check for intent detection (guided conversations)
-            intent = self.detect_intent(user_input) if not self.strict_mode else None
+            with trace.span('intent_detection'):
+                intent = self.detect_intent(user_input) if not self.strict_mode else None
 
             # Link entities to knowledge base
-            enhanced_input = self.link_entities(user_input, entities)
+            with trace.span('entity_linking'):
+                enhanced_input = self.link_entities(user_input, entities)
 
             # Use Transformers for conversational responses
-            response = self.get_ai_response(enhanced_input, model, image_data)
+            pieces = []
+            for piece in self.stream_ai_response(enhanced_input, model, image_data, trace=trace):
+                pieces.append(piece)
+                yield piece
 
             # Add guided conversation elements if intent detected
-            if intent and intent != 'general':
-                guided_response = self.generate_guided_response(intent, entities, response)
-                if guided_response:
-                    response = guided_response
-
-            return response
+            with trace.span('post_processing'):
+                extra = None
+                if intent and intent != 'general':
+                    response = "".join(pieces)
+                    guided_response = self.generate_guided_response(intent, entities, response)
+                    if guided_response and guided_response.startswith(response):
+                        extra = guided_response[len(response):]
+            if extra:
+                yield extra
+        finally:
+            self.tracer.finish(trace)
+
+    def load_intents(self, path=None):
+        # Built-in intents plus any extra keywords (or new intents) from intents.json in the data
+        # dir or the given path
+        index = IntentIndex(DEFAULT_INTENTS)
+        for intent, keywords in load_intent_vocabulary(path or os.path.join(self.data_dir, 'intents.json')).items():
+            index.add(intent, keywords)
+        return index
 
     def detect_intent(self, user_input):
-        # Simple intent detection for guided conversations
-        intents = {
-            'restaurant': ['restaurant', 'food', 'eat', 'dinner', 'lunch', 'breakfast', 'hungry', 'meal'],
-            'weather': ['weather', 'temperature', 'rain', 'sunny', 'cloudy', 'forecast'],
-            'directions': ['directions', 'where', 'location', 'address', 'map', 'navigate'],
-            'shopping': ['buy', 'purchase', 'shop', 'store', 'price', 'cost'],
-            'booking': ['book', 'reserve', 'appointment', 'schedule', 'ticket'],
-            'learning': ['learn', 'study', 'course', 'tutorial', 'teach', 'explain'],
-            'travel': ['travel', 'flight', 'hotel', 'vacation', 'trip', 'journey'],
-            'health': ['health', 'doctor', 'medicine', 'symptom', 'pain', 'sick'],
-            'finance': ['money', 'bank', 'account', 'budget', 'investment', 'loan']
-        }
-
-        user_input_lower = user_input.lower()
-        for intent, keywords in intents.items():
-            if any(keyword in user_input_lower for keyword in keywords):
-                return intent
-
-        return 'general'
+        # Intent detection for guided conversations: the intent whose keywords appear most in the
+        # input (as whole words), 'general' if none do
+        return self.intent_index.classify(user_input)
 
     def link_entities(self, user_input, entities):
         # Link extracted entities to knowledge base for enhanced responses
         enhanced_input = user_input
 
-        for entity in entities:
-            entity_value = entity['value'].lower()
-            if entity_value in self.knowledge_base:
-                kb_entry = self.knowledge_base[entity_value]
+        # One knowledge base query for all entities
+        entity_values = [entity['value'].lower() for entity in entities]
+        kb_entries = self.knowledge_base.get_many(entity_values) if entity_values else {}
+        for entity_value in entity_values:
+            if entity_value in kb_entries:
+                kb_entry = kb_entries[entity_value]
                 # Add knowledge context to input
                 enhanced_input += f" [Entity: {entity_value} is a {kb_entry['type']}. {kb_entry['info']}]"
 
@@ -428,10 +1139,11 @@ class OrionChatbot:
         return base_response
 
     def get_custom_response(self, user_input):
-        # Simple keyword matching for custom responses
-        for key, responses in self.responses.items():
-            if key in user_input:
-                return random.choice(responses)
+        # Keyword matching for custom responses. The longest keyword found in the input wins,
+        # so "what is python" is answered as such rather than as "what".
+        key = self.response_index.best_match(user_input)
+        if key is not None:
+            return random.choice(self.responses[key])
         # Default response if no match found
         return "I'm not sure how to respond to that. Can you try rephrasing or use /help for commands?"
 
@@ -450,6 +1162,24 @@ class OrionChatbot:
             description = parts[2].lower()
             code = self.generate_code(language, description)
             return code
+        elif command.startswith('/draft'):
+            draft_name = command[7:].strip()  # Remove '/draft ' from command
+            if not draft_name:
+                current = self.draft_model_name or "none"
+                return f"Draft model: {current}\nUsage: /draft <model folder or Hugging Face id> | /draft off\nExample: /draft Qwen/Qwen2.5-0.5B-Instruct"
+            if not self.llm:
+                return "Load a local model first."
+            if draft_name.lower() == 'off':
+                self.set_draft_model(None)
+                return "Speculative decoding turned off for this model."
+            if self.set_draft_model(draft_name):
+                return f"Replies from {self.model_name} now use {draft_name} as a draft model."
+            return f"Could not use {draft_name} as a draft model for {self.model_name}."
+        elif command == '/trace':
+            trace = self.get_last_trace()
+            if trace is None:
+                return "No replies have been timed yet."
+            return f"Latency breakdown of the last reply:\n{self.format_trace(trace)}"
         elif command == '/model':
             model_key = f"{model} ({self.model_version})"
             model_info = {
@@ -470,7 +1200,7 @@ class OrionChatbot:
             }
             return f"Current Model Information:\n{model_info.get(model_key, f'{model_key} - Model information not available')}"
         elif command == '/help':
-            return "Available commands:\n/changelog - Show changelog\n/model - Show current model info\n/code <lang> <desc> - Generate code\n/analyze <text> - Analyze text\n/summarize <text> - Summarize text\n/calc <expression> - Calculate math expression\n/joke - Tell a joke\n/fact - Share a random fact\n/calendar - Show current date/time and calendar\n/reminder <text> - Set a reminder\n/reminders - Show all reminders\n/image <query> - Search Google for image descriptions\n/generateimage <prompt> - Generate an image based on description\n/video <query> - Search for videos\n/roleplay <persona> - Switch to role-playing mode\n/verify_age <birth_year> <birth_month> <birth_day> <confirm> <robot_answer> - Verify age for adult content (answer 'no' to 'are you a robot?', confirm with 'yes' or 'confirm')\n/help - Show this help\n/clear - Clear chat history\n/exit - Exit the app"
+            return "Available commands:\n/changelog - Show changelog\n/model - Show current model info\n/code <lang> <desc> - Generate code\n/analyze <text> - Analyze text\n/summarize <text> - Summarize text\n/calc <expression> - Calculate math expression\n/joke - Tell a joke\n/fact - Share a random fact\n/calendar - Show current date/time and calendar\n/reminder <text> - Set a reminder\n/reminders - Show all reminders\n/image <query> - Search Google for image descriptions\n/generateimage <prompt> - Generate an image based on description\n/video <query> - Search for videos\n/roleplay <persona> - Switch to role-playing mode\n/draft <model|off> - Speed up replies with a small draft model\n/trace - Show where time went in the last reply\n/verify_age <birth_year> <birth_month> <birth_day> <confirm> <robot_answer> - Verify age for adult content (answer 'no' to 'are you a robot?', confirm with 'yes' or 'confirm')\n/help - Show this help\n/clear - Clear chat history\n/exit - Exit the app"
         elif command.startswith('/analyze'):
             text = command[9:].strip()  # Remove '/analyze ' from command
             if text:
@@ -550,9 +1280,10 @@ class OrionChatbot:
                     {'role': 'user', 'content': f"Generate a very short, concise title (max 4-5 words) for a conversation that starts with: '{user_text}'. Do not use quotes. Return ONLY the title text."}
                 ]
                 prompt = self.llm.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
-                response = self.llm(prompt, max_new_tokens=20, do_sample=True, temperature=0.7)
-                generated_text = response[0]['generated_text']
-                return generated_text[len(prompt):].strip().strip('"').strip("'")
+                # Greedy, so the same opening message gets its title from the response cache
+                generated_text = "".join(self._stream_generate(prompt, prefix_messages=[], stop='title', max_new_tokens=20, do_sample=False))
+                generated_text = generated_text.strip().split("\n")[0]  # Generation stops at the end of the first line
+                return generated_text.strip().strip('"').strip("'")
             except Exception as e:
                 print(f"Title Gen Error: {e}")
                 pass
@@ -570,9 +1301,8 @@ class OrionChatbot:
                 ]
                 prompt = self.llm.tokenizer.apply_chat_template(messages, tokenize=False, add_generation_prompt=True)
                 
-                response = self.llm(prompt, max_new_tokens=512, do_sample=False) # Greedy
-                generated_text = response[0]['generated_text']
-                return generated_text[len(prompt):].strip()
+                generated_text = "".join(self._stream_generate(prompt, prefix_messages=messages[:1], stop='code', max_new_tokens=512, do_sample=False)) # Greedy
+                return generated_text.strip()
             except Exception as e:
                 print(f"Code generation error: {e}")
                 pass
@@ -821,6 +1551,14 @@ class OrionChatbot:
 
 # For testing purposes
 if __name__ == "__main__":
+    if "--serve" in sys.argv:
+        # Headless HTTP mode: python main.py --serve [--host H] [--port P] [--model PATH] [--workers N]
+        import server
+        args = server.parse_args([arg for arg in sys.argv[1:] if arg != "--serve"])
+        orion = OrionChatbot(model_path=args.model, intra_op_threads=args.threads, inter_op_threads=args.interop_threads)
+        server.serve(orion, args.host, args.port, args.workers)
+        sys.exit(0)
+
     orion = OrionChatbot()
     print("Orion Chatbot initialized. Type 'exit' to quit.")
     try:
@@ -0,0 +1,32 @@
+import json
+import os
+
+CONFIG_FILE = "orion_model.json"
+
+
+def model_config_path(model_name, data_dir):
+    # Model folders (e.g. in .orion/models) keep their settings inside the folder;
+    # Hugging Face ids get a settings file in .orion/models named after the repo
+    if os.path.isdir(model_name):
+        return os.path.join(model_name, CONFIG_FILE)
+    return os.path.join(data_dir, 'models', model_name.replace('/', '--') + '.orion.json')
+
+
+def load_model_config(model_name, data_dir):
+    try:
+        with open(model_config_path(model_name, data_dir), 'r', encoding='utf-8') as f:
+            config = json.load(f)
+        return config if isinstance(config, dict) else {}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_model_config(model_name, data_dir, **changes):
+    # Merge changes into the stored settings for one model
+    config = load_model_config(model_name, data_dir)
+    config.update(changes)
+    path = model_config_path(model_name, data_dir)
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(config, f, indent=4)
+    return config
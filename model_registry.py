@@ -0,0 +1,115 @@
+import gc
+import os
+import threading
+from collections import OrderedDict
+
+
+def total_memory():
+    # Physical RAM in bytes, or None if it can't be determined
+    try:
+        return os.sysconf('SC_PAGE_SIZE') * os.sysconf('SC_PHYS_PAGES')
+    except (AttributeError, ValueError, OSError):
+        pass
+    try:
+        import ctypes
+
+        class MEMORYSTATUSEX(ctypes.Structure):
+            _fields_ = [('dwLength', ctypes.c_ulong), ('dwMemoryLoad', ctypes.c_ulong),
+                        ('ullTotalPhys', ctypes.c_ulonglong), ('ullAvailPhys', ctypes.c_ulonglong),
+                        ('ullTotalPageFile', ctypes.c_ulonglong), ('ullAvailPageFile', ctypes.c_ulonglong),
+                        ('ullTotalVirtual', ctypes.c_ulonglong), ('ullAvailVirtual', ctypes.c_ulonglong),
+                        ('ullAvailExtendedVirtual', ctypes.c_ulonglong)]
+
+        status = MEMORYSTATUSEX()
+        status.dwLength = ctypes.sizeof(MEMORYSTATUSEX)
+        if ctypes.windll.kernel32.GlobalMemoryStatusEx(ctypes.byref(status)):
+            return status.ullTotalPhys
+    except Exception:
+        pass
+    return None
+
+
+def default_memory_budget():
+    # Half of physical RAM for resident models, 8 GB if RAM size is unknown
+    memory = total_memory()
+    return memory // 2 if memory else 8 * 1024 ** 3
+
+
+def model_memory(llm):
+    # Bytes held by a model's (or pipeline's) weights and buffers, tied weights counted once
+    model = getattr(llm, 'model', llm)
+    seen = set()
+    total = 0
+    for tensor in list(model.parameters()) + list(model.buffers()):
+        if tensor.data_ptr() in seen:
+            continue
+        seen.add(tensor.data_ptr())
+        total += tensor.numel() * tensor.element_size()
+    for module in model.modules():
+        if hasattr(module, '_packed_params') and callable(getattr(module, 'weight', None)):  # Quantized Linear weights aren't parameters
+            for tensor in (module.weight(), module.bias()):
+                if tensor is not None:
+                    total += tensor.numel() * tensor.element_size()
+    return total
+
+
+class ModelRegistry:
+    # Loaded models kept in memory so switching back to one doesn't reload it from disk.
+    # When the total size goes over the budget, the least recently used models are dropped.
+    # The model just loaded is never evicted, even if it alone exceeds the budget.
+    def __init__(self, memory_budget=None):
+        self.memory_budget = memory_budget or default_memory_budget()
+        self.entries = OrderedDict()  # name -> (pipeline, prefix caches, draft, size in bytes)
+        self.lock = threading.Lock()
+
+    def _key(self, name):
+        return os.path.normcase(os.path.abspath(name)) if os.path.isdir(name) else name
+
+    def get(self, name):
+        # (pipeline, prefix caches, draft) for a resident model, marking it most recently used
+        with self.lock:
+            key = self._key(name)
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            llm, prefix_caches, draft, _ = self.entries[key]
+            return llm, prefix_caches, draft
+
+    def __contains__(self, name):
+        return self._key(name) in self.entries
+
+    def put(self, name, llm, prefix_caches, draft=None):
+        # Register a freshly loaded model, with its optional (name, model) draft, and evict others
+        # until the budget fits. Returns evicted names.
+        size = model_memory(llm) + (model_memory(draft[1]) if draft else 0)
+        with self.lock:
+            key = self._key(name)
+            self.entries[key] = (llm, prefix_caches, draft, size)
+            self.entries.move_to_end(key)
+            return self._evict()
+
+    def remove(self, name):
+        with self.lock:
+            removed = self.entries.pop(self._key(name), None)
+        if removed is not None:
+            gc.collect()
+        return removed is not None
+
+    def set_budget(self, memory_budget):
+        # Shrinking the budget evicts right away, oldest first, keeping the most recent model
+        with self.lock:
+            self.memory_budget = memory_budget
+            return self._evict()
+
+    def memory_used(self):
+        return sum(entry[-1] for entry in self.entries.values())
+
+    def _evict(self):
+        # Called with the lock held
+        evicted = []
+        while len(self.entries) > 1 and self.memory_used() > self.memory_budget:
+            old_key, _ = self.entries.popitem(last=False)
+            evicted.append(old_key)
+        if evicted:
+            gc.collect()  # Give the weights back now rather than whenever the collector runs
+        return evicted
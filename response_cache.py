@@ -0,0 +1,88 @@
+import hashlib
+import json
+import os
+import threading
+from collections import OrderedDict
+
+
+class ResponseCache:
+    # Content-addressed LRU cache for deterministic (greedy) generations. The key is a hash of
+    # the model id, the prompt and the generation parameters, so any change to one of them is a miss.
+    # With a path, entries are also kept on disk and survive restarts.
+    def __init__(self, max_entries=256, path=None):
+        self.max_entries = max_entries
+        self.path = path
+        self.entries = OrderedDict()  # key -> response (any JSON value), least recently used first
+        self.lock = threading.Lock()
+        if path:
+            self._load()
+
+    @staticmethod
+    def make_key(model_id, prompt, params):
+        payload = json.dumps([model_id, prompt, params], sort_keys=True, default=str)
+        return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+    def get(self, key):
+        with self.lock:
+            if key not in self.entries:
+                return None
+            self.entries.move_to_end(key)
+            return self.entries[key]
+
+    def put(self, key, response):
+        with self.lock:
+            self.entries[key] = response
+            self.entries.move_to_end(key)
+            while len(self.entries) > self.max_entries:
+                self.entries.popitem(last=False)
+            if self.path:
+                self._save()
+
+    def clear(self):
+        with self.lock:
+            self.entries.clear()
+            if self.path:
+                self._save()
+
+    def set_path(self, path):
+        # Turn disk persistence on (path) or off (None); turning it off removes the file
+        with self.lock:
+            if self.path and not path:
+                try:
+                    os.remove(self.path)
+                except OSError:
+                    pass
+            self.path = path
+        if path:
+            self._load()
+            with self.lock:
+                self._save()
+
+    def _load(self):
+        try:
+            with open(self.path, 'r', encoding='utf-8') as f:
+                stored = json.load(f)
+        except (OSError, ValueError):
+            return
+        if not isinstance(stored, list):
+            return
+        with self.lock:
+            # Stored oldest first; entries already in memory are more recent
+            merged = OrderedDict((key, response) for key, response in stored if isinstance(key, str))
+            for key, response in self.entries.items():
+                merged.pop(key, None)
+                merged[key] = response
+            while len(merged) > self.max_entries:
+                merged.popitem(last=False)
+            self.entries = merged
+
+    def _save(self):
+        # Called with the lock held; write to a temp file first so a crash can't leave half a file
+        try:
+            os.makedirs(os.path.dirname(self.path), exist_ok=True)
+            temp_path = self.path + '.tmp'
+            with open(temp_path, 'w', encoding='utf-8') as f:
+                json.dump(list(self.entries.items()), f)
+            os.replace(temp_path, self.path)
+        except OSError as e:
+            print(f"Could not save response cache: {e}")
@@ -0,0 +1,298 @@
+import queue
+import threading
+
+
+def cache_layers(cache):
+    # (keys, values) tensors per layer for both the current and older transformers cache layouts
+    if hasattr(cache, "layers"):
+        return [(layer.keys, layer.values) for layer in cache.layers]
+    if hasattr(cache, "key_cache"):
+        return list(zip(cache.key_cache, cache.value_cache))
+    return [(layer[0], layer[1]) for layer in cache]
+
+
+def build_cache(layers):
+    from transformers import DynamicCache
+
+    cache = DynamicCache()
+    for layer_idx, (keys, values) in enumerate(layers):
+        cache.update(keys, values, layer_idx)
+    return cache
+
+
+# Generation settings the scheduler applies itself (with model.generate's defaults), and ones that
+# don't change what gets generated. Anything else has to go through model.generate.
+SAMPLING_DEFAULTS = {'do_sample': False, 'temperature': 1.0, 'top_k': 50, 'top_p': 1.0, 'repetition_penalty': 1.0}
+NEUTRAL_SETTINGS = {'max_new_tokens', 'max_length', 'past_key_values', 'pad_token_id', 'bos_token_id', 'eos_token_id',
+                    'use_cache', 'return_dict_in_generate', 'output_attentions', 'output_hidden_states',
+                    'transformers_version', '_from_model_config'}
+
+
+class SchedulerStopped(RuntimeError):
+    # The scheduler was stopped before the request finished (model switch, thread count change)
+    pass
+
+
+def effective_sampling(generation_config, generate_kwargs):
+    # The sampling settings model.generate would use for these keyword arguments on a model with
+    # this generation_config (e.g. Qwen2.5's repetition_penalty=1.1), or None if they need
+    # something the scheduler doesn't implement
+    settings = generation_config.to_diff_dict() if generation_config is not None else {}
+    settings.update(generate_kwargs)
+    if any(key not in SAMPLING_DEFAULTS and key not in NEUTRAL_SETTINGS for key in settings):
+        return None
+    sampling = {key: default if settings.get(key) is None else settings[key] for key, default in SAMPLING_DEFAULTS.items()}
+    sampling['do_sample'] = bool(sampling['do_sample'])
+    return sampling
+
+
+def sample_token(logits, sequence_ids, do_sample=False, temperature=1.0, top_k=50, top_p=1.0, repetition_penalty=1.0):
+    # Same order as transformers' logits processors: repetition penalty (over prompt and reply so
+    # far), then temperature, top-k and top-p
+    import torch
+
+    logits = logits.float()
+    if repetition_penalty != 1.0:
+        seen = torch.tensor(sequence_ids)
+        scores = logits.gather(0, seen)
+        scores = torch.where(scores < 0, scores * repetition_penalty, scores / repetition_penalty)
+        logits = logits.scatter(0, seen, scores)
+    if not do_sample:
+        return int(torch.argmax(logits))
+
+    logits = logits / max(temperature, 1e-5)
+    if top_k and top_k < logits.shape[-1]:
+        kth = torch.topk(logits, top_k).values[-1]
+        logits = logits.masked_fill(logits < kth, float("-inf"))
+    if top_p < 1.0:
+        sorted_logits, sorted_idx = torch.sort(logits, descending=True)
+        cumulative = torch.softmax(sorted_logits, dim=-1).cumsum(dim=-1)
+        remove = cumulative > top_p
+        remove[1:] = remove[:-1].clone()  # Keep the token that crosses the threshold
+        remove[0] = False
+        logits = logits.masked_fill(remove.scatter(0, sorted_idx, remove), float("-inf"))
+    return int(torch.multinomial(torch.softmax(logits, dim=-1), 1))
+
+
+class GenerationRequest:
+    # One generation job; sampling is a dict from effective_sampling (greedy if not given)
+    def __init__(self, prompt_ids, streamer=None, stopping_criteria=None, past_key_values=None,
+                 max_new_tokens=512, sampling=None):
+        self.prompt_ids = list(prompt_ids)
+        self.streamer = streamer
+        self.stopping_criteria = stopping_criteria
+        self.past_key_values = past_key_values  # Optional prefix cache; replaced by the full cache when done
+        self.max_new_tokens = max_new_tokens
+        self.sampling = dict(SAMPLING_DEFAULTS, **(sampling or {}))
+        self.output_ids = []
+        self.error = None
+        self.done = threading.Event()
+
+    @property
+    def sequence_ids(self):
+        return self.prompt_ids + self.output_ids
+
+    def wait(self):
+        # Block until the request is finished; re-raises whatever made it fail
+        self.done.wait()
+        if self.error is not None:
+            raise self.error
+        return self
+
+
+class _Slot:
+    # A request that is currently part of the decode batch
+    def __init__(self, request, length, next_token):
+        self.request = request
+        self.length = length  # Real (non-padding) tokens in this row's KV cache
+        self.next_token = next_token
+
+
+class BatchScheduler:
+    # Continuous batching on one loaded model: requests from any thread are queued, prefilled one by
+    # one as they arrive and then decoded together, one token per active request per forward pass.
+    # Finished requests leave the batch and waiting ones join between steps, so concurrent chats,
+    # title generation and API clients share forward passes instead of waiting on each other.
+    def __init__(self, model, eos_token_ids, max_batch_size=8, num_threads=None):
+        self.model = model
+        self.eos_token_ids = set(eos_token_ids)
+        self.max_batch_size = max_batch_size
+        self.num_threads = num_threads  # Torch intra-op threads for the decode loop, None = torch default
+        self.pending = queue.Queue()
+        self.running = True
+        self.thread = threading.Thread(target=self._loop, daemon=True)
+        self.thread.start()
+
+    def submit(self, request):
+        # Queue a request from any thread. When it finishes, output_ids and past_key_values
+        # (covering prompt and reply, like model.generate returns) are filled in and done is set.
+        if not self.running:
+            raise SchedulerStopped("Scheduler has been stopped")
+        self.pending.put(request)
+        return request
+
+    def set_num_threads(self, num_threads):
+        # Takes effect before the next forward pass; requests in flight carry on
+        self.num_threads = num_threads
+
+    def stop(self):
+        self.running = False
+        self.pending.put(None)  # Wake up the loop
+
+    def _loop(self):
+        import torch
+
+        threads = None  # Intra-op thread count applied to this thread, which does all the work
+        slots = []
+        layers = None  # Batched (keys, values) per layer, left-padded to a common length
+        mask = None  # [batch, length] attention mask, 0 over padding
+
+        while self.running:
+            if self.num_threads and self.num_threads != threads:
+                threads = self.num_threads
+                torch.set_num_threads(threads)
+
+            # Admit waiting requests; block only when there is nothing to decode
+            while len(slots) < self.max_batch_size:
+                try:
+                    request = self.pending.get(block=not slots)
+                except queue.Empty:
+                    break
+                if request is None:
+                    break
+                try:
+                    with torch.no_grad():
+                        slot, request_layers = self._prefill(request)
+                except Exception as e:
+                    self._finish(request, error=e)
+                    continue
+                if self._emit(slot):
+                    self._finish(request, request_layers)
+                    continue
+                slots.append(slot)
+                layers, mask = self._merge(layers, mask, request_layers, slot.length)
+
+            if not slots:
+                continue
+
+            try:
+                with torch.no_grad():
+                    logits, layers, mask = self._decode_step(slots, layers, mask)
+            except Exception as e:
+                for slot in slots:
+                    self._finish(slot.request, error=e)
+                slots, layers, mask = [], None, None
+                continue
+
+            keep = []
+            for row, slot in enumerate(slots):
+                slot.length += 1
+                slot.next_token = sample_token(logits[row], slot.request.sequence_ids, **slot.request.sampling)
+                if self._emit(slot):
+                    self._finish(slot.request, self._extract(layers, row, slot.length))
+                else:
+                    keep.append(row)
+
+            if len(keep) < len(slots):
+                slots = [slots[row] for row in keep]
+                if slots:
+                    index = torch.tensor(keep)
+                    layers = [(k.index_select(0, index), v.index_select(0, index)) for k, v in layers]
+                    mask = mask.index_select(0, index)
+                    # Drop padding columns no remaining row needs anymore
+                    trim = mask.shape[1] - max(slot.length for slot in slots)
+                    if trim > 0:
+                        layers = [(k[:, :, trim:], v[:, :, trim:]) for k, v in layers]
+                        mask = mask[:, trim:]
+                else:
+                    layers, mask = None, None
+
+        # Fail whatever is still queued when the scheduler is stopped
+        for slot in slots:
+            self._finish(slot.request, error=SchedulerStopped("Scheduler stopped"))
+        while not self.pending.empty():
+            request = self.pending.get_nowait()
+            if request is not None:
+                self._finish(request, error=SchedulerStopped("Scheduler stopped"))
+
+    def _prefill(self, request):
+        import torch
+
+        # Only the part of the prompt not already covered by a prefix cache is run through the model
+        cache = request.past_key_values
+        cached = cache.get_seq_length() if cache is not None else 0
+        input_ids = torch.tensor([request.prompt_ids[cached:]])
+        kwargs = {'past_key_values': cache} if cache is not None else {}
+        output = self.model(input_ids=input_ids, use_cache=True, **kwargs)
+        next_token = sample_token(output.logits[0, -1], request.prompt_ids, **request.sampling)
+        if request.streamer is not None:
+            request.streamer.put(torch.tensor([request.prompt_ids]))  # Like generate, streamers see the prompt first
+        return _Slot(request, len(request.prompt_ids), next_token), cache_layers(output.past_key_values)
+
+    def _decode_step(self, slots, layers, mask):
+        import torch
+
+        input_ids = torch.tensor([[slot.next_token] for slot in slots])
+        position_ids = torch.tensor([[slot.length] for slot in slots])
+        attention_mask = torch.cat([mask, mask.new_ones((len(slots), 1))], dim=1)
+        cache = build_cache(layers)
+        output = self.model(input_ids=input_ids, attention_mask=attention_mask, position_ids=position_ids,
+                            past_key_values=cache, use_cache=True)
+        return output.logits[:, -1], cache_layers(cache), attention_mask
+
+    def _merge(self, layers, mask, new_layers, length):
+        import torch
+
+        new_mask = torch.ones((1, length), dtype=torch.long)
+        if layers is None:
+            return new_layers, new_mask
+
+        # Left-pad whichever side is shorter so every row ends at the same column
+        width = max(mask.shape[1], length)
+        merged = []
+        for (k, v), (nk, nv) in zip(layers, new_layers):
+            merged.append((torch.cat([self._pad(k, width), self._pad(nk, width)], dim=0),
+                           torch.cat([self._pad(v, width), self._pad(nv, width)], dim=0)))
+        mask = torch.cat([self._pad(mask, width), self._pad(new_mask, width)], dim=0)
+        return merged, mask
+
+    def _pad(self, tensor, width):
+        import torch.nn.functional as F
+
+        # Left-pad the sequence dimension (dim 2 for KV tensors, dim 1 for the mask)
+        missing = width - tensor.shape[-1 if tensor.dim() == 2 else 2]
+        if missing <= 0:
+            return tensor
+        if tensor.dim() == 2:
+            return F.pad(tensor, (missing, 0))
+        return F.pad(tensor, (0, 0, missing, 0))
+
+    def _extract(self, layers, row, length):
+        # This row's cache without padding, i.e. what model.generate would have returned
+        return [(k[row:row + 1, :, -length:], v[row:row + 1, :, -length:]) for k, v in layers]
+
+    def _emit(self, slot):
+        # Record the freshly sampled token and report whether the request is finished
+        import torch
+
+        request = slot.request
+        token = slot.next_token
+        request.output_ids.append(token)
+        if request.streamer is not None and token not in self.eos_token_ids:
+            request.streamer.put(torch.tensor([token]))
+
+        if token in self.eos_token_ids or len(request.output_ids) >= request.max_new_tokens:
+            return True
+        if request.stopping_criteria is not None:
+            stop = request.stopping_criteria(torch.tensor([request.sequence_ids]), None)
+            if bool(stop.any() if hasattr(stop, "any") else stop):
+                return True
+        return False
+
+    def _finish(self, request, layers=None, error=None):
+        request.error = error
+        request.past_key_values = build_cache(layers) if layers is not None else None
+        # On failure the caller decides what happens to the stream (it may retry without batching)
+        if request.streamer is not None and error is None:
+            request.streamer.end()
+        request.done.set()
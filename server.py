@@ -0,0 +1,286 @@
+"""Headless OpenAI-compatible HTTP server for Orion.
+
+Usage:
+    python main.py --serve [--host 127.0.0.1] [--port 8000] [--model <model folder or Hugging Face id>] [--workers 4]
+                           [--threads 0] [--interop-threads 0]
+
+Endpoints:
+    GET  /v1/models
+    POST /v1/chat/completions   (set "stream": true for server-sent events)
+
+Connections are handled on an asyncio event loop; generation runs on a thread pool so one slow
+reply doesn't hold up other clients. Only the standard library is used here, and nothing from
+the desktop app (customtkinter, winsound, plyer) is imported.
+"""
+import argparse
+import asyncio
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+MAX_BODY_BYTES = 10 * 1024 * 1024
+
+REASONS = {200: "OK", 400: "Bad Request", 404: "Not Found", 405: "Method Not Allowed",
+           413: "Payload Too Large", 500: "Internal Server Error"}
+
+
+class HTTPError(Exception):
+    def __init__(self, status, message, error_type="invalid_request_error"):
+        super().__init__(message)
+        self.status = status
+        self.message = message
+        self.error_type = error_type
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="Run Orion as an OpenAI-compatible HTTP server")
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--model", default=None, help="Model folder or Hugging Face id (default: Orion's default model)")
+    parser.add_argument("--workers", type=int, default=4, help="Generation threads; concurrent requests are batched together")
+    parser.add_argument("--threads", type=int, default=0, help="Torch intra-op threads for inference (0 = automatic)")
+    parser.add_argument("--interop-threads", type=int, default=0, help="Torch inter-op threads (0 = automatic)")
+    return parser.parse_args(argv)
+
+
+def message_text(content):
+    # OpenAI clients may send content as a list of parts; only text parts are used
+    if isinstance(content, list):
+        return "".join(part.get("text", "") for part in content if isinstance(part, dict) and part.get("type") == "text")
+    return content if isinstance(content, str) else ""
+
+
+def usage_payload(usage):
+    # OpenAI-style usage object from the counts filled in by OrionChatbot._stream_generate_ids
+    # (empty when no model is loaded and the reply came from the built-in responses)
+    prompt_tokens = usage.get('prompt_tokens', 0)
+    completion_tokens = usage.get('completion_tokens', 0)
+    return {'prompt_tokens': prompt_tokens, 'completion_tokens': completion_tokens,
+            'total_tokens': prompt_tokens + completion_tokens,
+            'prompt_tokens_details': {'cached_tokens': usage.get('cached_prompt_tokens', 0)}}
+
+
+class OrionServer:
+    def __init__(self, orion, workers=4):
+        self.orion = orion
+        self.executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix="orion-worker")
+
+    @property
+    def model_id(self):
+        return self.orion.model_name or "orion"
+
+    async def handle_connection(self, reader, writer):
+        try:
+            method, path, headers, body = await self.read_request(reader)
+            await self.route(method, path, headers, body, writer)
+        except HTTPError as e:
+            await self.send_json(writer, e.status, {'error': {'message': e.message, 'type': e.error_type}})
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass  # Client went away
+        except Exception as e:
+            print(f"Server error: {e}")
+            try:
+                await self.send_json(writer, 500, {'error': {'message': str(e), 'type': "server_error"}})
+            except Exception:
+                pass
+        finally:
+            writer.close()
+
+    async def read_request(self, reader):
+        request_line = (await reader.readline()).decode("latin-1").strip()
+        if not request_line:
+            raise ConnectionError("Empty request")
+        try:
+            method, target, _ = request_line.split(" ", 2)
+        except ValueError:
+            raise HTTPError(400, "Malformed request line")
+
+        headers = {}
+        while True:
+            line = (await reader.readline()).decode("latin-1")
+            if line in ("\r\n", "\n", ""):
+                break
+            name, _, value = line.partition(":")
+            headers[name.strip().lower()] = value.strip()
+
+        try:
+            length = int(headers.get("content-length", 0) or 0)
+        except ValueError:
+            raise HTTPError(400, "Content-Length must be a number")
+        if length < 0:
+            raise HTTPError(400, "Content-Length must not be negative")
+        if length > MAX_BODY_BYTES:
+            raise HTTPError(413, "Request body too large")
+        body = await reader.readexactly(length) if length else b""
+        return method.upper(), target.split("?", 1)[0], headers, body
+
+    async def route(self, method, path, headers, body, writer):
+        path = path.rstrip("/")
+        if path == "/v1/models":
+            if method != "GET":
+                raise HTTPError(405, "Use GET")
+            await self.send_json(writer, 200, {'object': "list", 'data': [
+                {'id': self.model_id, 'object': "model", 'created': 0, 'owned_by': "orion"}]})
+        elif path == "/v1/chat/completions":
+            if method != "POST":
+                raise HTTPError(405, "Use POST")
+            await self.chat_completions(body, writer)
+        else:
+            raise HTTPError(404, f"Unknown endpoint {path}")
+
+    def parse_chat_request(self, body):
+        try:
+            payload = json.loads(body or b"{}")
+        except ValueError:
+            raise HTTPError(400, "Body must be JSON")
+        messages = payload.get("messages") if isinstance(payload, dict) else None
+        if not isinstance(messages, list) or not messages:
+            raise HTTPError(400, "'messages' must be a non-empty list")
+        if not all(isinstance(m, dict) for m in messages):
+            raise HTTPError(400, "Each message must be an object")
+        messages = [{'role': m.get('role', 'user'), 'content': message_text(m.get('content'))} for m in messages]
+
+        # Clients often send null for options they don't set; that means the default
+        temperature = payload.get("temperature")
+        top_p = payload.get("top_p")
+        max_tokens = payload.get("max_tokens")
+        if max_tokens is None:
+            max_tokens = payload.get("max_completion_tokens")
+        try:
+            options = {
+                'max_new_tokens': int(512 if max_tokens is None else max_tokens),
+                'temperature': float(0.6 if temperature is None else temperature),
+                'top_p': float(0.9 if top_p is None else top_p),
+            }
+        except (TypeError, ValueError):
+            raise HTTPError(400, "max_tokens, temperature and top_p must be numbers")
+        if options['max_new_tokens'] < 1:
+            raise HTTPError(400, "max_tokens must be at least 1")
+
+        stop = payload.get("stop")
+        if isinstance(stop, str):
+            stop = [stop]
+        if stop is not None and not (isinstance(stop, list) and all(isinstance(s, str) for s in stop)):
+            raise HTTPError(400, "'stop' must be a string or a list of strings")
+        options['stop'] = stop
+        stream_options = payload.get("stream_options")
+        include_usage = isinstance(stream_options, dict) and bool(stream_options.get("include_usage"))
+        return messages, options, bool(payload.get("stream")), include_usage
+
+    async def chat_completions(self, body, writer):
+        messages, options, stream, include_usage = self.parse_chat_request(body)
+        completion_id = f"chatcmpl-{uuid.uuid4().hex}"
+        created = int(time.time())
+        base = {'id': completion_id, 'created': created, 'model': self.model_id}
+        usage = {}
+
+        if not stream:
+            loop = asyncio.get_running_loop()
+            text = await loop.run_in_executor(
+                self.executor, lambda: "".join(self.orion.stream_chat_completion(messages, usage=usage, **options)).strip())
+            await self.send_json(writer, 200, dict(base, object="chat.completion", choices=[{
+                'index': 0, 'message': {'role': "assistant", 'content': text}, 'finish_reason': "stop"}],
+                usage=usage_payload(usage)))
+            return
+
+        writer.write(self.head(200, "text/event-stream", extra={'Cache-Control': "no-cache"}))
+        chunk = dict(base, object="chat.completion.chunk")
+
+        async def send_event(delta, finish_reason=None):
+            event = dict(chunk, choices=[{'index': 0, 'delta': delta, 'finish_reason': finish_reason}])
+            writer.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+            await writer.drain()
+
+        await send_event({'role': "assistant", 'content': ""})
+        try:
+            async for piece in self.iterate_in_worker(self.orion.stream_chat_completion(messages, usage=usage, **options)):
+                await send_event({'content': piece})
+        except ConnectionError:
+            raise
+        except Exception as e:
+            # Headers are already sent, so the error goes out as an event, followed by the usual
+            # end of stream so clients don't wait for more
+            print(f"Server error: {e}")
+            writer.write(f"data: {json.dumps({'error': {'message': str(e), 'type': 'server_error'}})}\n\n".encode("utf-8"))
+            writer.write(b"data: [DONE]\n\n")
+            await writer.drain()
+            return
+        await send_event({}, "stop")
+        if include_usage:
+            # Like OpenAI, usage comes in one last chunk with no choices
+            event = dict(chunk, choices=[], usage=usage_payload(usage))
+            writer.write(f"data: {json.dumps(event)}\n\n".encode("utf-8"))
+        writer.write(b"data: [DONE]\n\n")
+        await writer.drain()
+
+    async def iterate_in_worker(self, generator):
+        # Drive a blocking generator on the worker pool and hand its items to the event loop.
+        # If the client disconnects, the generator is closed, which stops generation.
+        loop = asyncio.get_running_loop()
+        items = asyncio.Queue()
+        done = object()
+        cancelled = threading.Event()
+
+        def pump():
+            try:
+                for item in generator:
+                    if cancelled.is_set():
+                        break
+                    loop.call_soon_threadsafe(items.put_nowait, item)
+            except Exception as e:
+                loop.call_soon_threadsafe(items.put_nowait, e)
+            finally:
+                generator.close()  # Must happen on this thread, where the generator runs
+                loop.call_soon_threadsafe(items.put_nowait, done)
+
+        loop.run_in_executor(self.executor, pump)
+        try:
+            while True:
+                item = await items.get()
+                if item is done:
+                    break
+                if isinstance(item, Exception):
+                    raise item
+                yield item
+        finally:
+            cancelled.set()
+
+    def head(self, status, content_type, length=None, extra=None):
+        lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}", f"Content-Type: {content_type}", "Connection: close"]
+        if length is not None:
+            lines.append(f"Content-Length: {length}")
+        for name, value in (extra or {}).items():
+            lines.append(f"{name}: {value}")
+        return ("\r\n".join(lines) + "\r\n\r\n").encode("latin-1")
+
+    async def send_json(self, writer, status, payload):
+        data = json.dumps(payload).encode("utf-8")
+        writer.write(self.head(status, "application/json", len(data)) + data)
+        await writer.drain()
+
+
+def serve(orion, host="127.0.0.1", port=8000, workers=4):
+    app = OrionServer(orion, workers)
+
+    async def main():
+        server = await asyncio.start_server(app.handle_connection, host, port)
+        print(f"Orion API listening on http://{host}:{port}/v1 (model: {app.model_id})")
+        async with server:
+            await server.serve_forever()
+
+    try:
+        asyncio.run(main())
+    except KeyboardInterrupt:
+        print("\n[System] Server stopped.")
+    finally:
+        app.executor.shutdown(wait=False)
+
+
+if __name__ == "__main__":
+    from main import OrionChatbot
+
+    args = parse_args()
+    orion = OrionChatbot(model_path=args.model, intra_op_threads=args.threads, inter_op_threads=args.interop_threads)
+    serve(orion, args.host, args.port, args.workers)
@@ -0,0 +1,108 @@
+import os
+import pickle
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from chat_storage import ENC_MAGIC, xor_cipher
+from chat_store import ChatStore
+
+
+def write_encrypted(path, chat_data):
+    with open(path, "wb") as f:
+        f.write(ENC_MAGIC + xor_cipher(pickle.dumps(chat_data)))
+
+
+def test_migrate_imports_every_legacy_format(tmp_path):
+    write_encrypted(tmp_path / "chat_1.dat", {'history': ["You: hello", "Orion: hi", "You: how are you"],
+                                              'model': "Basic", 'timestamp': 1.0, 'pinned': True})
+    write_encrypted(tmp_path / "chat_2.dat", {'history': ["You: encrypted"], 'timestamp': 2.0, 'custom_title': "Secret"})
+    with open(tmp_path / "chat_3.dat", "wb") as f:
+        pickle.dump({'history': ["You: plain pickle"], 'timestamp': 3.0}, f)
+    (tmp_path / "chat_index.json").write_text("{}")
+
+    store = ChatStore(str(tmp_path))
+    assert len(store) == 3
+    assert store.load(1) == {'history': ["You: hello", "Orion: hi", "You: how are you"], 'model': "Basic",
+                             'timestamp': 1.0, 'pinned': True}
+    assert store.get(2)['title'] == "Secret"
+    assert store.load(3)['history'] == ["You: plain pickle"]
+
+    # The originals are kept as backups, under a name that isn't imported again
+    names = set(os.listdir(tmp_path))
+    assert {"chat_1.dat.imported", "chat_2.dat.imported", "chat_3.dat.imported", "chat_index.json.imported"} <= names
+    assert not names & {"chat_1.dat", "chat_2.dat", "chat_3.dat", "chat_index.json"}
+    store.close()
+    store = ChatStore(str(tmp_path))
+    assert store.imported == 0 and len(store) == 3
+    store.close()
+
+
+def test_deleting_chats_removes_their_backups(tmp_path):
+    for chat_id in (1, 2, 3):
+        with open(tmp_path / f"chat_{chat_id}.dat", "wb") as f:
+            pickle.dump({'history': [f"You: chat {chat_id}"]}, f)
+    (tmp_path / "chat_index.json").write_text("{}")
+    (tmp_path / "notes.imported").write_text("not ours")
+
+    store = ChatStore(str(tmp_path))
+    assert store.imported == 3
+    store.delete(2)
+    assert "chat_2.dat.imported" not in os.listdir(tmp_path)
+    assert "chat_1.dat.imported" in os.listdir(tmp_path)
+    assert store.clear() == 2
+    assert sorted(os.listdir(tmp_path)) == ["chats.db", "notes.imported"]
+    store.close()
+
+
+def test_migrate_leaves_unreadable_files_in_place(tmp_path):
+    (tmp_path / "chat_1.dat").write_bytes(b"not a pickle")
+    (tmp_path / "chat_x.dat").write_bytes(pickle.dumps({'history': []}))
+    (tmp_path / "chat_index.json").write_text("{}")
+
+    store = ChatStore(str(tmp_path))
+    assert len(store) == 0
+    assert sorted(os.listdir(tmp_path)) == ["chat_1.dat", "chat_index.json", "chat_x.dat", "chats.db"]
+    store.close()
+
+
+def test_save_is_incremental(tmp_path):
+    store = ChatStore(str(tmp_path))
+    store.save(1, {'history': ["You: one", "Orion: two"], 'timestamp': 1.0})
+    ids = [row[0] for row in store.connection.execute("SELECT id FROM messages ORDER BY position")]
+
+    # Appending keeps the stored rows
+    store.save(1, {'history': ["You: one", "Orion: two", "You: three"], 'timestamp': 2.0})
+    rows = list(store.connection.execute("SELECT id, text FROM messages ORDER BY position"))
+    assert [row[0] for row in rows[:2]] == ids
+    assert [row[1] for row in rows] == ["You: one", "Orion: two", "You: three"]
+
+    # Editing a message rewrites it and everything after it
+    store.save(1, {'history': ["You: one", "Orion: changed"], 'timestamp': 3.0})
+    rows = list(store.connection.execute("SELECT id, text FROM messages ORDER BY position"))
+    assert rows[0][0] == ids[0]
+    assert [row[1] for row in rows] == ["You: one", "Orion: changed"]
+
+    store.close()
+    store = ChatStore(str(tmp_path))
+    assert store.load(1)['history'] == ["You: one", "Orion: changed"]
+    assert store.get(1)['message_count'] == 2
+    store.close()
+
+
+def test_list_orders_and_searches_messages(tmp_path):
+    store = ChatStore(str(tmp_path))
+    store.save(1, {'history': ["You: the weather in Paris", "Orion: sunny"], 'timestamp': 1.0})
+    store.save(2, {'history': ["You: a recipe for pancakes"], 'timestamp': 2.0})
+    store.save(3, {'history': ["You: old pinned chat"], 'timestamp': 0.5, 'pinned': True})
+
+    assert [entry['id'] for entry in store.list()] == [3, 2, 1]
+    assert [entry['id'] for entry in store.list("sunny")] == [1]  # Message text, not the title
+    assert [entry['id'] for entry in store.list("recipe pan")] == [2]  # Every word, the last one as a prefix
+    assert [entry['id'] for entry in store.list("PARIS")] == [1]
+    assert store.list("sunny", search_messages=False) == []
+    assert store.list("nothing like this") == []
+
+    store.delete(1)
+    assert store.list("sunny") == []
+    store.close()
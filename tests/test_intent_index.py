@@ -0,0 +1,96 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from intent_index import DEFAULT_INTENTS, IntentIndex, word_forms
+
+
+def old_detect_intent(text):
+    # The linear scan detect_intent used to do: first intent with a keyword anywhere in the text
+    text = text.lower()
+    for intent, keywords in DEFAULT_INTENTS.items():
+        if any(keyword in text for keyword in keywords):
+            return intent
+    return 'general'
+
+
+# Inputs the old scan and the index classify the same way
+SAME = [
+    "Is it raining in Paris?",
+    "it rained yesterday",
+    "sunny day at the beach",
+    "I'm hungry, where can I eat?",
+    "eating lunch",
+    "How do I get to the station? directions please",
+    "I want to buy a new phone",
+    "Shopping for shoes",
+    "priced too high",
+    "What does it cost?",
+    "Can I book an appointment?",
+    "scheduled meetings",
+    "Explain recursion",
+    "learning to cook",
+    "teaches python",
+    "travelling abroad",
+    "My symptoms are getting worse",
+    "I feel sick and in pain",
+    "I need a loan from the bank",
+    "hello there",
+]
+
+# Deliberate changes, as (input, old intent, intent now):
+CHANGED = [
+    # Keywords only match whole words, so they no longer fire inside other words
+    ("weather", "restaurant", "weather"),  # "eat" in "weather"
+    ("What's the weather forecast?", "restaurant", "weather"),
+    ("This is great", "restaurant", "general"),  # "eat" in "great"
+    ("nowhere to go", "directions", "general"),  # "where" in "nowhere"
+    ("bookstore nearby", "shopping", "general"),  # "store" in "bookstore"
+    # Every intent is scored and the best one wins, instead of the first in priority order
+    ("I'm booking a flight and a hotel", "booking", "travel"),
+    # Inflections the substring scan couldn't see
+    ("I studied all night", "general", "learning"),
+]
+
+
+@pytest.fixture(scope="module")
+def index():
+    return IntentIndex(DEFAULT_INTENTS)
+
+
+@pytest.mark.parametrize("text", SAME)
+def test_same_as_linear_scan(index, text):
+    assert index.classify(text) == old_detect_intent(text)
+
+
+@pytest.mark.parametrize("text, old, new", CHANGED)
+def test_changes_from_linear_scan(index, text, old, new):
+    assert old_detect_intent(text) == old
+    assert index.classify(text) == new
+
+
+@pytest.mark.parametrize("word, base", [
+    ("raining", "rain"), ("shopping", "shop"), ("priced", "price"), ("studies", "study"),
+    ("flights", "flight"), ("taxes", "tax"), ("booked", "book"),
+])
+def test_word_forms(word, base):
+    assert word_forms(word)[0] == word
+    assert base in word_forms(word)
+
+
+def test_short_bases_are_not_stripped():
+    assert word_forms("sing") == ("sing",)
+    assert word_forms("bed") == ("bed",)
+
+
+def test_phrases_score_by_length_and_ties_follow_priority():
+    index = IntentIndex({'music': ['song'], 'events': ['live music', 'concert tickets']})
+    assert index.scores("buying concert tickets for a song") == {'events': 2, 'music': 1}
+    assert index.classify("buying concert tickets for a song") == 'events'
+    assert index.classify("a song about live music") == 'events'
+    assert index.classify("a song at a concert") == 'music'
+    assert IntentIndex({'a': ['x'], 'b': ['x']}).classify("x") == 'a'
+    assert index.classify("nothing here", default='other') == 'other'
@@ -0,0 +1,85 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import main
+from keyword_index import KeywordIndex
+
+
+@pytest.fixture(scope="module")
+def chatbot(tmp_path_factory):
+    # Just what get_custom_response needs: the built-in table and its index
+    orion = SimpleNamespace(data_dir=str(tmp_path_factory.mktemp("data")))
+    orion.responses = main.OrionChatbot.load_responses(orion)
+    return orion
+
+
+def old_match(responses, text):
+    # The linear scan get_custom_response used to do: first key in table order found anywhere
+    for key in responses:
+        if key in text:
+            return key
+    return None
+
+
+# Inputs the old scan and the index answer the same way
+SAME = [
+    "hi", "hi there", "how are you today?", "what is your name", "thanks a lot", "thank you so much",
+    "bye!", "tell me a joke please", "good morning orion", "okay then", "wow", "no", "really?",
+    "that's cool", "where are you from", "what time is it", "explain ai to me", "hey you", "exit", "nice",
+    "xyz", "",
+]
+
+# Deliberate changes, as (input, key the old scan picked, key picked now):
+# the longest key wins instead of the first one in the table...
+LONGEST = [
+    ("hello orion", "hello", "hello orion"),
+    ("what is python", "what", "what is python"),
+    ("what is javascript", "what", "what is javascript"),
+    ("what is java", "what", "what is java"),
+    ("show changelog", "how", "show changelog"),
+    ("can you help me", "help", "can you help me"),
+    ("what version are you", "what", "what version are you"),
+    ("how to learn programming", "how", "how to learn programming"),
+]
+# ...and keys only match whole words, not inside other words
+WHOLE_WORDS = [
+    ("nothing", "hi", None),
+    ("i know", "no", None),
+    ("yesterday", "yes", None),
+    ("which one", "hi", None),
+    ("show me", "how", None),
+    ("they", "hey", None),
+    ("somewhere", "where", None),
+    ("helpful", "help", None),
+    ("i need help with this", "hi", "i need help"),
+    ("i think so too", "hi", "i think so"),
+]
+
+
+@pytest.mark.parametrize("text", SAME)
+def test_same_as_linear_scan(chatbot, text):
+    assert chatbot.response_index.best_match(text) == old_match(chatbot.responses, text)
+
+
+@pytest.mark.parametrize("text, old, new", LONGEST + WHOLE_WORDS)
+def test_changes_from_linear_scan(chatbot, text, old, new):
+    assert old_match(chatbot.responses, text) == old
+    assert chatbot.response_index.best_match(text) == new
+
+
+def test_ties_go_to_the_key_listed_first():
+    index = KeywordIndex(["good day", "nice day", "day"])
+    assert index.best_match("a good day, a nice day") == "good day"
+    assert index.find_all("a good day, a nice day") == ["good day", "day", "nice day", "day"]
+
+
+def test_key_with_punctuation_and_longer_candidates():
+    index = KeywordIndex(["what is java", "what is javascript", "what", "that's cool"])
+    assert index.best_match("so what is javascripts?") == "what"
+    assert index.best_match("that's cool!") == "that's cool"
+    assert KeywordIndex([]).best_match("anything") is None
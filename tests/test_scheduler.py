@@ -0,0 +1,32 @@
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+torch = pytest.importorskip("torch")
+transformers = pytest.importorskip("transformers")
+
+from scheduler import effective_sampling, sample_token
+
+
+def test_effective_sampling_merges_generation_config():
+    config = transformers.GenerationConfig(do_sample=True, temperature=0.7, top_k=20, top_p=0.8,
+                                           repetition_penalty=1.1, eos_token_id=[2, 3], pad_token_id=2)
+    assert effective_sampling(config, {'do_sample': False, 'max_new_tokens': 20}) == {
+        'do_sample': False, 'temperature': 0.7, 'top_k': 20, 'top_p': 0.8, 'repetition_penalty': 1.1}
+    assert effective_sampling(config, {'temperature': 0.6})['temperature'] == 0.6
+
+
+def test_effective_sampling_rejects_unsupported_settings():
+    assert effective_sampling(transformers.GenerationConfig(), {'no_repeat_ngram_size': 3}) is None
+    assert effective_sampling(transformers.GenerationConfig(num_beams=4), {}) is None
+
+
+def test_sample_token_applies_repetition_penalty_like_generate():
+    logits = torch.tensor([1.0, 2.0, 1.9, -1.0])
+    processor = transformers.RepetitionPenaltyLogitsProcessor(1.5)
+    expected = processor(torch.tensor([[1, 3]]), logits.unsqueeze(0).clone())[0]
+    assert sample_token(logits, [1, 3], repetition_penalty=1.5) == int(torch.argmax(expected)) == 2
+    assert sample_token(logits, [1, 3]) == 1
@@ -0,0 +1,62 @@
+import asyncio
+import json
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from server import HTTPError, OrionServer
+
+
+class FakeOrion:
+    model_name = "fake"
+
+    def stream_chat_completion(self, messages, usage=None, **options):
+        yield "Hello"
+        raise RuntimeError("out of memory")
+
+
+class FakeWriter:
+    def __init__(self):
+        self.data = b""
+
+    def write(self, data):
+        self.data += data
+
+    async def drain(self):
+        pass
+
+
+def request(**payload):
+    payload.setdefault('messages', [{'role': "user", 'content': "hi"}])
+    return json.dumps(payload).encode("utf-8")
+
+
+def test_parse_chat_request_defaults_and_nulls():
+    server = OrionServer(FakeOrion(), workers=1)
+    _, options, stream, _ = server.parse_chat_request(request(temperature=None, top_p=None, max_tokens=None))
+    assert options['max_new_tokens'] == 512
+    assert options['temperature'] == 0.6 and options['top_p'] == 0.9
+    assert not stream
+    _, options, _, _ = server.parse_chat_request(request(max_completion_tokens=7))
+    assert options['max_new_tokens'] == 7
+
+
+@pytest.mark.parametrize("max_tokens", [0, -5, "many"])
+def test_parse_chat_request_rejects_bad_max_tokens(max_tokens):
+    server = OrionServer(FakeOrion(), workers=1)
+    with pytest.raises(HTTPError) as error:
+        server.parse_chat_request(request(max_tokens=max_tokens))
+    assert error.value.status == 400
+
+
+def test_stream_ends_with_done_after_an_error():
+    server = OrionServer(FakeOrion(), workers=1)
+    writer = FakeWriter()
+    asyncio.run(server.chat_completions(request(stream=True), writer))
+    events = [line[6:] for line in writer.data.decode("utf-8").split("\n") if line.startswith("data: ")]
+    assert json.loads(events[1])['choices'][0]['delta'] == {'content': "Hello"}
+    assert json.loads(events[-2])['error']['message'] == "out of memory"
+    assert events[-1] == "[DONE]"
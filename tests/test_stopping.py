@@ -0,0 +1,101 @@
+import os
+import sys
+from types import SimpleNamespace
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+torch = pytest.importorskip("torch")
+
+from main import OrionChatbot, _StopOnText
+
+VOCAB = ["<end>", " ", "Hi", " there", "\n", "Us", "er", ":", "Hello", "!"]
+END = 0
+
+
+class FakeTokenizer:
+    # One vocabulary entry per token id; id 0 is a special end-of-turn token
+    def decode(self, ids, skip_special_tokens=False):
+        return "".join(VOCAB[i] for i in ids.tolist() if not (skip_special_tokens and i == END))
+
+
+def ids(*tokens):
+    return torch.tensor([[VOCAB.index(token) for token in tokens]])
+
+
+def run(criterion, prompt, chunks):
+    # Feed the sequence to the criterion the way generate does, one chunk of new tokens per call;
+    # returns the index of the chunk that stopped generation, or None
+    sequence = list(prompt)
+    for index, chunk in enumerate(chunks):
+        sequence += chunk
+        if criterion(ids(*sequence), None):
+            return index
+    return None
+
+
+def test_stop_string_split_across_tokens():
+    criterion = _StopOnText(FakeTokenizer(), prompt_length=1, stop_strings=["User:"])
+    assert run(criterion, ["Hi"], [["Hello"], ["\n"], ["Us"], ["er"], [":"], ["!"]]) == 4
+
+
+def test_whitespace_stop_string_needs_text_first():
+    criterion = _StopOnText(FakeTokenizer(), prompt_length=1, stop_strings=["\n"])
+    assert run(criterion, ["Hi"], [["\n"], [" "], ["Hello"], [" there"], ["\n"]]) == 4
+
+
+def test_stop_token_inside_a_multi_token_chunk():
+    # Assisted generation can accept several draft tokens in one step
+    criterion = _StopOnText(FakeTokenizer(), prompt_length=1, stop_token_ids=[END])
+    assert run(criterion, ["Hi"], [["Hello"], ["!", "<end>", "Hi"], ["!"]]) == 1
+
+
+def test_stop_token_in_the_prompt_is_ignored():
+    criterion = _StopOnText(FakeTokenizer(), prompt_length=2, stop_token_ids=[END], stop_strings=["User:"])
+    assert run(criterion, ["Hi", "<end>"], [["Hello"], [" there"]]) is None
+
+
+def filtered(pieces, stop_strings=("User:",)):
+    return list(OrionChatbot._filter_ai_stream(SimpleNamespace(), iter(pieces), list(stop_strings)))
+
+
+def old_cleanup(text):
+    # What get_ai_response did with the finished reply before streaming
+    reply = text.strip()
+    if reply.startswith("Orion:"):
+        reply = reply[6:].strip()
+    if "User:" in reply:
+        reply = reply.split("User:")[0].strip()
+    return reply
+
+
+@pytest.mark.parametrize("text", [
+    "Hello there!",
+    "  Orion: Hello there!  ",
+    "Orion:Hello",
+    "Orion:",
+    "Orion",
+    "Ori",
+    "Hello\n\nUser: what about you?\nOrion: fine",
+    "User: nothing before it",
+    "Orion: User: hi",
+    "Say \"Us\" and \"er\" but not the marker. U",
+    "Hello Use",
+    "",
+    "   ",
+])
+@pytest.mark.parametrize("size", [1, 2, 3, 7, 1000])
+def test_filter_matches_old_cleanup(text, size):
+    pieces = [text[i:i + size] for i in range(0, len(text), size)]
+    assert "".join(filtered(pieces)) == old_cleanup(text)
+
+
+def test_filter_holds_back_a_possible_stop_string():
+    stream = OrionChatbot._filter_ai_stream(SimpleNamespace(), iter(["Hello Us", "er: fake turn"]), ["User:"])
+    assert next(stream) == "Hello"  # " Us" could be the start of "User:", so it waits
+    assert list(stream) == []
+
+
+def test_filter_releases_held_text_that_is_not_a_stop_string():
+    assert filtered(["Hello Us", "ually fine"]) == ["Hello", " Usually fine"]
@@ -0,0 +1,89 @@
+import json
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+
+class RequestTrace:
+    # Timing of one request, split into named spans (entity_extraction, intent_detection,
+    # templating, tokenization, prefill, decode, post_processing, ...). Times are perf_counter
+    # based and reported in milliseconds from the start of the request.
+    def __init__(self, name):
+        self.name = name
+        self.started_at = time.time()
+        self.start = time.perf_counter()
+        self.end = None
+        self.spans = []
+        self.usage = {}
+        self.lock = threading.Lock()  # Prefill and decode are recorded from the generation thread
+
+    @contextmanager
+    def span(self, name):
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.add_span(name, start, time.perf_counter())
+
+    def add_span(self, name, start, end):
+        # For stages timed elsewhere (e.g. on the inference thread); start and end are perf_counter values
+        with self.lock:
+            self.spans.append({'name': name, 'start_ms': (start - self.start) * 1000,
+                               'duration_ms': (end - start) * 1000})
+
+    def stage_ms(self, name):
+        # Total time spent in a stage (it may appear more than once, e.g. tokenization)
+        with self.lock:
+            return sum(span['duration_ms'] for span in self.spans if span['name'] == name)
+
+    def tokens_per_second(self):
+        # Decode throughput: tokens after the first one over decode time
+        decode_ms = self.stage_ms('decode')
+        tokens = self.usage.get('completion_tokens', 0) - 1
+        if decode_ms <= 0 or tokens <= 0:
+            return None
+        return tokens / (decode_ms / 1000)
+
+    def to_dict(self):
+        total_ms = ((self.end or time.perf_counter()) - self.start) * 1000
+        with self.lock:
+            spans = sorted(self.spans, key=lambda span: span['start_ms'])
+        return {'name': self.name, 'started_at': self.started_at, 'total_ms': total_ms,
+                'spans': spans, 'usage': dict(self.usage), 'tokens_per_second': self.tokens_per_second()}
+
+
+class Tracer:
+    # Keeps the most recent request traces in memory and, with a path, appends each finished
+    # one to a JSONL file as a single line
+    def __init__(self, max_traces=100, path=None):
+        self.traces = deque(maxlen=max_traces)
+        self.path = path
+        self.lock = threading.Lock()
+
+    def start(self, name):
+        return RequestTrace(name)
+
+    def finish(self, trace):
+        trace.end = time.perf_counter()
+        record = trace.to_dict()
+        with self.lock:
+            self.traces.append(record)
+            if self.path:
+                try:
+                    os.makedirs(os.path.dirname(self.path), exist_ok=True)
+                    with open(self.path, 'a', encoding='utf-8') as f:
+                        f.write(json.dumps(record) + '\n')
+                except OSError as e:
+                    print(f"Could not write trace log: {e}")
+        return record
+
+    def recent(self, limit=None):
+        with self.lock:
+            traces = list(self.traces)
+        return traces[-limit:] if limit else traces
+
+    def clear(self):
+        with self.lock:
+            self.traces.clear()